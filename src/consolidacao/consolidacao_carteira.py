@@ -4,15 +4,8 @@ import pandas as pd
 
 from src.consolidacao.consolidacao_variavel import consolidar_renda_variavel
 from src.consolidacao.consolidacao_fixa import consolidar_renda_fixa
-from src.database.database import (
-    ler_aportes_rf,
-    ler_cotacoes,
-    ler_resgates_rf,
-    ler_transacoes_rv,
-    ler_proventos_rv,
-    ler_ativos_rv,
-    ler_proporcoes,
-)
+from src.database.cache_cotacoes import ler_cache_cotacoes, salvar_cache_cotacoes
+from src.database.database import carregar_snapshot, ler_cotacoes_com_versao
 
 
 def tratar_proventos(proventos: pd.DataFrame) -> pd.DataFrame:
@@ -32,19 +25,66 @@ def _calcular_variacoes(cotacoes: pd.DataFrame) -> pd.DataFrame:
     return cotacoes
 
 
+def _janelas_cotacoes(tabelas: dict[str, pd.DataFrame]) -> dict[str, date]:
+    """Define quais cotações a carteira precisa e a partir de quando: cada ativo
+    RV desde a sua primeira transação e o VNA desde a compra do título IPCA + mais
+    antigo. O CDI, além de indexador, é a referência do rendimento diário da
+    carteira, então começa na data mais antiga de todas."""
+
+    aportes_rf = tabelas["aportes_rf"]
+    janelas = tabelas["transacoes_rv"].groupby("codigo")["data"].min().to_dict()
+
+    aportes_ipca = aportes_rf.loc[aportes_rf["index"].eq("IPCA +"), "data_compra"]
+    if not aportes_ipca.empty:
+        janelas["VNA"] = aportes_ipca.min()
+
+    datas = list(janelas.values()) + aportes_rf["data_compra"].tolist()
+    if datas:
+        janelas["CDI"] = min(datas)
+    return janelas
+
+
+def atualizar_cache_cotacoes():
+    """Grava o cache colunar com todas as cotações já processadas. Deve ser
+    chamada depois de cada atualização da tabela cotacoes."""
+
+    cotacoes, versao = ler_cotacoes_com_versao()
+    salvar_cache_cotacoes(_calcular_variacoes(cotacoes), versao)
+
+
+def carregar_tabelas() -> tuple[dict[str, pd.DataFrame], dict[str, int]]:
+    """Lê todas as tabelas da carteira numa única transação, com as cotações
+    apenas nas janelas necessárias (ou do cache colunar, se atualizado) e já com
+    a variação calculada. Retorna também as versões das tabelas, lidas na mesma
+    transação, para que quem cacheia as tabelas saiba a que estado elas
+    correspondem. O tempo de carga de cada tabela é impresso."""
+
+    tabelas, versoes, tempos = carregar_snapshot(
+        janelas_cotacoes=_janelas_cotacoes, cotacoes_em_cache=ler_cache_cotacoes
+    )
+    print(
+        f"Tabelas carregadas em {sum(tempos.values()):.3f}s: "
+        + ", ".join(f"{tabela} {tempo:.3f}s" for tabela, tempo in tempos.items())
+    )
+    if not tabelas["cotacoes"].attrs.get("variacoes_calculadas"):
+        tabelas["cotacoes"] = _calcular_variacoes(tabelas["cotacoes"])
+    return tabelas, versoes
+
+
 # O schema dos dataframes retornados está no arquivo diagrama_tabelas.drawio
 def consolidar_carteira() -> dict[str, pd.DataFrame]:
-    cotacoes = _calcular_variacoes(ler_cotacoes())
-    proventos = tratar_proventos(ler_proventos_rv())
-    ativos_rv = ler_ativos_rv()
-    transacoes_rv = ler_transacoes_rv()
+    tabelas, _ = carregar_tabelas()
+    cotacoes = tabelas["cotacoes"]
+    proventos = tratar_proventos(tabelas["proventos_rv"])
+    ativos_rv = tabelas["ativos_rv"]
+    transacoes_rv = tabelas["transacoes_rv"]
     patrimonio_rv, carteira_rv = consolidar_renda_variavel(transacoes_rv, cotacoes)
-    aportes_rf = ler_aportes_rf()
-    resgates_rf = ler_resgates_rf()
+    aportes_rf = tabelas["aportes_rf"]
+    resgates_rf = tabelas["resgates_rf"]
     patrimonio_rf, carteira_rf = consolidar_renda_fixa(
         aportes_rf, resgates_rf, cotacoes
     )
-    proporcoes = ler_proporcoes()
+    proporcoes = tabelas["proporcoes"]
 
     return {
         "proventos": proventos,
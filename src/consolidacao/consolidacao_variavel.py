@@ -2,7 +2,7 @@ from datetime import date
 
 import pandas as pd
 
-from src.utils.calendario import dias_uteis_no_intervalo
+from src.utils.calendario import CALENDARIO_PREGAO, dias_uteis_no_intervalo
 
 
 def calcula_qtd_preco_medio(df: pd.DataFrame) -> pd.DataFrame:
@@ -52,7 +52,7 @@ def consolidar_renda_variavel(
     )
     preco_medio = pd.concat([transacoes_rv_agg, preco_medio], axis=1)
 
-    # Cria uma tabela com todos os dias úteis entre a primeira transação e
+    # Cria uma tabela com todos os dias de pregão entre a primeira transação e
     # o dia de hoje
     primeira_trans = transacoes_rv_agg.groupby("codigo")["data"].min().to_dict()
     dias = pd.concat(
@@ -60,7 +60,9 @@ def consolidar_renda_variavel(
             pd.DataFrame(
                 {
                     "codigo": codigo,
-                    "data": dias_uteis_no_intervalo(data_ini, date.today()),
+                    "data": dias_uteis_no_intervalo(
+                        data_ini, date.today(), CALENDARIO_PREGAO
+                    ),
                 }
             )
             for codigo, data_ini in primeira_trans.items()
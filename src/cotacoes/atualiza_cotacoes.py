@@ -1,71 +1,318 @@
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, timedelta
+from typing import Callable
 
-from src.utils.calendario import dias_uteis_no_intervalo
-from src.cotacoes.indicadores import IMAB5, VNA, TickerBolsa, CDI
-from src.database.database import ler_datas_cotacoes, inserir_cotacao
-
-indicadores = {
-    "ACWI11": TickerBolsa("ACWI11.SA"),
-    "B5P211": TickerBolsa("B5P211.SA"),
-    "BDIF11": TickerBolsa("BDIF11.SA"),
-    "CDI": CDI(),
-    "CDII11": TickerBolsa("CDII11.SA"),
-    "IBOV": TickerBolsa("^BVSP"),
-    "IMAB 5": IMAB5(),
-    "JURO11": TickerBolsa("JURO11.SA"),
-    "PIBB11": TickerBolsa("PIBB11.SA"),
-    "VNA": VNA(),
+import pandas as pd
+
+from src.utils.calendario import CALENDARIO_PREGAO, dias_uteis_no_intervalo
+from src.cotacoes.indicadores import IMAB5, VNA, TickerBolsa, CDI, IndicadorAbstrato
+from src.consolidacao.consolidacao_carteira import atualizar_cache_cotacoes
+from src.database.database import (
+    criar_tabelas,
+    ler_ativos_rv,
+    ler_datas_faltantes,
+    ler_primeira_data_cotacoes,
+    inserir_cotacoes,
+    registrar_indisponiveis,
+)
+
+# Indicadores que não dependem da carteira. Os ativos de renda variável vêm da
+# tabela ativos_rv.
+INDICADORES_FIXOS: dict[str, Callable[[], IndicadorAbstrato]] = {
+    "CDI": CDI,
+    "IBOV": lambda: TickerBolsa("^BVSP"),
+    "IMAB 5": IMAB5,
+    "VNA": VNA,
 }
 
 
-def atualizar_indicadores(dias: int = 180):
+def montar_indicadores() -> dict[str, IndicadorAbstrato]:
+    """Monta o registro de indicadores a partir dos dados. Nenhum dado é baixado
+    aqui: cada indicador só busca a sua série quando é consultado pela
+    primeira vez, ou seja, quando há alguma data faltante."""
+
+    indicadores = {nome: fabrica() for nome, fabrica in INDICADORES_FIXOS.items()}
+    for codigo in ler_ativos_rv()["codigo"]:
+        indicadores.setdefault(codigo, TickerBolsa(f"{codigo}.SA"))
+    return dict(sorted(indicadores.items()))
+
+
+# Máximo de indicadores buscados ao mesmo tempo num mesmo servidor
+LIMITE_POR_HOST = 2
+
+# Uma data que a fonte não tem volta a ser pedida depois desta espera, que é
+# multiplicada por 4 a cada nova tentativa sem sucesso, até o máximo. A primeira
+# espera é curta porque a data mais recente pode só não ter sido divulgada ainda.
+ESPERA_INDISPONIVEL = timedelta(hours=6)
+ESPERA_MAXIMA_INDISPONIVEL = timedelta(days=30)
+
+
+def _datas_faltantes(
+    indicadores: dict[str, IndicadorAbstrato],
+    dias: int | None,
+    incluir_indisponiveis: bool = False,
+    data_fim: date | None = None,
+) -> dict[str, list[date]]:
+    """Datas sem cotação de todos os indicadores, numa única consulta. Com dias
+    None, varre todo o histórico de cada indicador, a partir da sua primeira
+    cotação. As datas marcadas como indisponíveis ficam de fora até a próxima
+    tentativa, a menos que incluir_indisponiveis seja True."""
+
+    data_fim = data_fim or date.today()
+    if dias is None:
+        data_inicio = ler_primeira_data_cotacoes() or data_fim
+    else:
+        data_inicio = data_fim - timedelta(days=dias)
+
+    # Ativos da bolsa não têm cotação em dias sem pregão
+    bolsa = [nome for nome, ind in indicadores.items() if isinstance(ind, TickerBolsa)]
+    outros = [nome for nome in indicadores if nome not in bolsa]
+    return ler_datas_faltantes(
+        [
+            (outros, dias_uteis_no_intervalo(data_inicio, data_fim)),
+            (bolsa, dias_uteis_no_intervalo(data_inicio, data_fim, CALENDARIO_PREGAO)),
+        ],
+        apos_primeira_cotacao=dias is None,
+        incluir_indisponiveis=incluir_indisponiveis,
+    )
+
+
+def _buscar(
+    indicador: IndicadorAbstrato, datas: list[date], semaforo: threading.Semaphore
+) -> tuple[list[float | None], float, float]:
+    """Extrai os valores das datas. Retorna os valores, o tempo de espera pela
+    vaga no servidor e o tempo de busca, em segundos."""
+
+    inicio = time.perf_counter()
+    with semaforo:
+        espera = time.perf_counter() - inicio
+        serie = indicador.extrair_datas(datas)
+    valores = [serie.get(data) for data in datas]
+    return valores, espera, time.perf_counter() - inicio - espera
+
+
+def _novas_linhas(nome_indicador: str, datas: list[date], valores) -> pd.DataFrame:
+    novas = pd.DataFrame({"data": datas, "codigo": nome_indicador, "valor": valores})
+    # Datas sem valor não são gravadas, para que continuem faltantes e passem
+    # pelas novas tentativas de cotacoes_indisponiveis
+    novas = novas.loc[novas["valor"].notnull()]
+    # O CDI é armazenado diretamente como variação diária
+    if nome_indicador == "CDI":
+        novas["variacao"] = novas.pop("valor")
+        novas["valor"] = None
+    else:
+        novas["variacao"] = None
+    return novas
+
+
+def _sem_valor(datas: list[date], novas: pd.DataFrame) -> list[date]:
+    encontradas = set(novas["data"])
+    return [data for data in datas if data not in encontradas]
+
+
+def _gravar(
+    nome_indicador: str, datas: list[date], valores: list, indisponiveis: dict
+) -> int:
+    novas = _novas_linhas(nome_indicador, datas, valores)
+    indisponiveis[nome_indicador] = _sem_valor(datas, novas)
+    return inserir_cotacoes(novas)
+
+
+def _buscar_bolsa(
+    tickers: list[str], data_inicio: date, semaforo: threading.Semaphore
+) -> tuple[pd.DataFrame, float, float]:
+    """Busca todos os ativos da bolsa numa única chamada, com a janela começando
+    em data_inicio. Retorna os fechamentos, o tempo de espera pela vaga no
+    servidor e o tempo de busca, em segundos."""
+
+    inicio = time.perf_counter()
+    with semaforo:
+        espera = time.perf_counter() - inicio
+        fechamentos = TickerBolsa.baixar_lote(tickers, data_inicio)
+    return fechamentos, espera, time.perf_counter() - inicio - espera
+
+
+def _gravar_bolsa(
+    tickers: dict[str, str],
+    pendentes: dict[str, list[date]],
+    fechamentos: pd.DataFrame,
+    espera: float,
+    busca: float,
+    indisponiveis: dict[str, list[date]],
+) -> list[tuple[str, int, int, float, float]]:
+    """Grava os fechamentos de todos os ativos da bolsa numa única escrita. As
+    datas sem cotação são acrescentadas a indisponiveis."""
+
+    novas = {
+        nome: _novas_linhas(
+            nome, pendentes[nome], fechamentos[ticker].reindex(pendentes[nome]).values
+        )
+        for ticker, nome in tickers.items()
+    }
+    inserir_cotacoes(pd.concat(novas.values(), ignore_index=True))
+
+    resumo = []
+    for nome, linhas in novas.items():
+        indisponiveis[nome] = _sem_valor(pendentes[nome], linhas)
+        resumo.append((nome, len(pendentes[nome]), len(linhas), espera, busca))
+        _informar(nome, len(linhas), pendentes[nome])
+    return resumo
+
+
+def _informar(nome_indicador: str, inseridas: int, datas_faltantes: list[date]):
+    if inseridas > 0:
+        print(f"{nome_indicador}: {inseridas} cotações inseridas.")
+    else:
+        print(f"{nome_indicador} tem dados faltantes mas não é possível preenchê-los.")
+        print(f"Datas faltantes: {', '.join(str(d) for d in datas_faltantes)}")
+
+
+def _imprimir_resumo(resumo: list[tuple[str, int, int, float, float]], total: float):
+    cabecalho = ("Indicador", "Faltantes", "Inseridas", "Espera", "Busca")
+    print("\n{:<10} {:>9} {:>9} {:>8} {:>8}".format(*cabecalho))
+    for nome, faltantes, inseridas, espera, busca in sorted(resumo):
+        print(
+            f"{nome:<10} {faltantes:>9} {inseridas:>9} {espera:>7.2f}s {busca:>7.2f}s"
+        )
+    print(f"Tempo total: {total:.2f}s")
+
+
+def atualizar_indicadores(
+    dias: int | None = 180,
+    limite_por_host: int = LIMITE_POR_HOST,
+    incluir_indisponiveis: bool = False,
+    data_fim: date | None = None,
+):
     """Verifica se há cotações faltantes dentro de um período de
-    tempo (padrão 180 dias). Se sim, serão extraídas e inseridas
-    diretamente no banco."""
+    tempo (padrão 180 dias; None para todo o histórico). Se sim, serão
+    extraídas e inseridas diretamente no banco.
 
-    data_fim = date.today()
-    data_inicio = data_fim - timedelta(days=dias)
-    dias_uteis = dias_uteis_no_intervalo(data_inicio, data_fim)
+    Se alguma cotação for gravada, o cache colunar das cotações é regravado.
 
-    for nome_indicador in indicadores:
-        datas_existentes = ler_datas_cotacoes(nome_indicador, dias_uteis[0])
-        datas_faltantes = [dia for dia in dias_uteis if dia not in datas_existentes]
+    Datas que a fonte não tem são marcadas na tabela cotacoes_indisponiveis e
+    só são pedidas de novo depois de uma espera crescente (ver
+    ESPERA_INDISPONIVEL), a menos que incluir_indisponiveis seja True.
 
-        if not datas_faltantes:
+    data_fim (padrão: hoje) fixa o fim do período, o que permite repetir uma
+    atualização gravada (ver simulacao).
+
+    Os indicadores são buscados em paralelo, com no máximo limite_por_host
+    buscas simultâneas por servidor, e gravados na thread principal à medida
+    que cada um termina. Os ativos da bolsa formam uma única busca, gravada
+    numa única escrita. Um indicador que falhar não interrompe os demais."""
+
+    inicio = time.perf_counter()
+    indicadores = montar_indicadores()
+    pendentes = _datas_faltantes(indicadores, dias, incluir_indisponiveis, data_fim)
+    print(f"Datas faltantes verificadas em {time.perf_counter() - inicio:.3f}s.")
+    for nome_indicador in indicadores:
+        if nome_indicador not in pendentes:
             print(f"Não há dados faltantes em {nome_indicador}")
-            continue
-
-        indicador = indicadores[nome_indicador]
-        valores = [indicador.extrair(data) for data in datas_faltantes]
-
-        count = 0
-        for data, valor in zip(datas_faltantes, valores):
-            if nome_indicador == "CDI":
-                inserir_cotacao(
-                    data=str(data),
-                    codigo=nome_indicador,
-                    valor=None,
-                    variacao=valor,
-                )
-                count += 1
-            else:
-                if valor is not None:
-                    inserir_cotacao(
-                        data=str(data),
-                        codigo=nome_indicador,
-                        valor=valor,
-                        variacao=None,
-                    )
-                    count += 1
-
-        if count > 0:
-            print(f"{nome_indicador}: {count} cotações inseridas.")
-        else:
-            print(
-                f"{nome_indicador} tem dados faltantes mas não é possível preenchê-los."
+
+    if not pendentes:
+        return
+
+    bolsa = {
+        nome: datas
+        for nome, datas in pendentes.items()
+        if isinstance(indicadores[nome], TickerBolsa)
+    }
+    pendentes = {nome: datas for nome, datas in pendentes.items() if nome not in bolsa}
+
+    resumo = []
+    indisponiveis = {}
+    hosts = {indicadores[nome].host for nome in [*bolsa, *pendentes]}
+    semaforos = {host: threading.Semaphore(limite_por_host) for host in hosts}
+    # Ativo da bolsa -> nome do indicador
+    tickers = {indicadores[nome].ticker: nome for nome in bolsa}
+    with ThreadPoolExecutor(max_workers=len(pendentes) + 1) as executor:
+        futuros = {
+            executor.submit(
+                _buscar,
+                indicadores[nome],
+                datas,
+                semaforos[indicadores[nome].host],
+            ): nome
+            for nome, datas in pendentes.items()
+        }
+        futuro_bolsa = None
+        if bolsa:
+            futuro_bolsa = executor.submit(
+                _buscar_bolsa,
+                list(tickers),
+                min(datas[0] for datas in bolsa.values()),
+                semaforos[TickerBolsa.host],
             )
-            print(f"Datas faltantes: {', '.join(str(d) for d in datas_faltantes)}")
+            futuros[futuro_bolsa] = "Bolsa"
+
+        for futuro in as_completed(futuros):
+            nome_indicador = futuros[futuro]
+            if futuro is futuro_bolsa:
+                try:
+                    fechamentos, espera, busca = futuro.result()
+                except Exception as erro:
+                    print(f"Bolsa: erro ao buscar cotações ({erro}).")
+                    resumo += [
+                        (nome, len(datas), 0, 0.0, 0.0) for nome, datas in bolsa.items()
+                    ]
+                    continue
+                resumo += _gravar_bolsa(
+                    tickers, bolsa, fechamentos, espera, busca, indisponiveis
+                )
+                continue
+
+            datas_faltantes = pendentes[nome_indicador]
+            try:
+                valores, espera, busca = futuro.result()
+            except Exception as erro:
+                print(f"{nome_indicador}: erro ao buscar cotações ({erro}).")
+                resumo.append((nome_indicador, len(datas_faltantes), 0, 0.0, 0.0))
+                continue
+
+            count = _gravar(nome_indicador, datas_faltantes, valores, indisponiveis)
+            resumo.append((nome_indicador, len(datas_faltantes), count, espera, busca))
+            _informar(nome_indicador, count, datas_faltantes)
+
+    marcadas = registrar_indisponiveis(
+        indisponiveis,
+        ESPERA_INDISPONIVEL.total_seconds(),
+        ESPERA_MAXIMA_INDISPONIVEL.total_seconds(),
+    )
+    if marcadas:
+        print(f"{marcadas} datas sem dados marcadas para nova tentativa mais tarde.")
+
+    # O cache colunar só fica desatualizado se alguma cotação foi gravada
+    if any(inseridas for _, _, inseridas, _, _ in resumo):
+        atualizar_cache_cotacoes()
+
+    _imprimir_resumo(resumo, time.perf_counter() - inicio)
+    IndicadorAbstrato.cliente.imprimir_estatisticas()
 
 
 if __name__ == "__main__":
-    atualizar_indicadores()
+    parser = argparse.ArgumentParser(description="Atualiza as cotações faltantes.")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument(
+        "--dias", type=int, default=180, help="janela verificada (padrão: 180)"
+    )
+    grupo.add_argument(
+        "--historico-completo",
+        action="store_true",
+        help="verifica todo o histórico de cada indicador",
+    )
+    parser.add_argument(
+        "--incluir-indisponiveis",
+        action="store_true",
+        help="pede de novo as datas já marcadas como indisponíveis",
+    )
+    argumentos = parser.parse_args()
+
+    # Atualiza o schema de bancos antigos antes de qualquer escrita
+    criar_tabelas()
+    atualizar_indicadores(
+        None if argumentos.historico_completo else argumentos.dias,
+        incluir_indisponiveis=argumentos.incluir_indisponiveis,
+    )
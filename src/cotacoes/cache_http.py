@@ -0,0 +1,212 @@
+"""
+Cache em disco das respostas baixadas pelos indicadores, em dados/cache/.
+
+Cada requisição (método, URL e corpo) aponta para um arquivo de metadados com o
+ETag, o Last-Modified, a data em que foi salva e o hash do conteúdo. O conteúdo
+em si é gravado pelo hash (conteudo/<sha256>), então respostas iguais ocupam um
+único arquivo. Enquanto a resposta estiver dentro do TTL da fonte, nenhuma
+requisição é feita. Depois disso ela é revalidada com If-None-Match e
+If-Modified-Since, quando o servidor informou esses cabeçalhos, e um 304 apenas
+renova a validade.
+
+O resultado do processamento de uma resposta (a série lida do HTML ou do CSV)
+também fica guardado pelo hash do conteúdo, então uma resposta que não mudou não
+é processada de novo.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urlencode, urlsplit
+
+import pandas as pd
+
+from src.cotacoes.cliente_http import ClienteHttp
+from src.database.database import CAMINHO_DADOS
+
+CAMINHO_CACHE = CAMINHO_DADOS / "cache"
+
+# Validade das respostas de cada servidor. Os arquivos da ANBIMA de uma data não
+# mudam depois de publicados; a página do CDI e o histórico do Yahoo ganham uma
+# linha por dia útil.
+TTLS_POR_HOST = {
+    "www.anbima.com.br": timedelta(hours=24),
+    "www.portaldefinancas.com": timedelta(hours=12),
+    "query2.finance.yahoo.com": timedelta(hours=12),
+}
+TTL_PADRAO = timedelta(hours=1)
+
+
+@dataclass
+class RespostaEmCache:
+    conteudo: bytes
+    encoding: str
+    hash: str
+    # "cache" (dentro do TTL), "revalidada" (304) ou "rede"
+    origem: str
+    # Se o conteúdo é diferente do que estava no cache
+    alterado: bool
+
+    @property
+    def texto(self) -> str:
+        return self.conteudo.decode(self.encoding, errors="replace")
+
+
+def _temporario(caminho: Path) -> Path:
+    # Um nome por processo e thread, para que gravações simultâneas da mesma
+    # chave não se misturem; o os.replace final é atômico
+    return caminho.with_name(
+        f"{caminho.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+
+
+def _gravar_atomico(caminho: Path, dados: bytes):
+    temporario = _temporario(caminho)
+    temporario.write_bytes(dados)
+    os.replace(temporario, caminho)
+
+
+def _gravar_pickle(caminho: Path, objeto: object):
+    temporario = _temporario(caminho)
+    pd.to_pickle(objeto, temporario)
+    os.replace(temporario, caminho)
+
+
+class CacheRespostas:
+    def __init__(
+        self,
+        diretorio: Path = CAMINHO_CACHE,
+        ttls_por_host: dict[str, timedelta] | None = None,
+    ):
+        self.diretorio = diretorio
+        self.ttls_por_host = TTLS_POR_HOST if ttls_por_host is None else ttls_por_host
+
+    def _caminho(self, subdiretorio: str, nome: str) -> Path:
+        caminho = self.diretorio / subdiretorio / nome
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        return caminho
+
+    def _ttl(self, host: str) -> float:
+        return self.ttls_por_host.get(host, TTL_PADRAO).total_seconds()
+
+    @staticmethod
+    def _chave(metodo: str, url: str, dados: dict | None) -> str:
+        requisicao = f"{metodo} {url} {urlencode(sorted((dados or {}).items()))}"
+        return hashlib.sha256(requisicao.encode()).hexdigest()
+
+    def _ler_metadados(self, chave: str) -> dict | None:
+        caminho = self._caminho("respostas", f"{chave}.json")
+        try:
+            metadados = json.loads(caminho.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        # Conteúdo removido à mão: trata como se não houvesse cache
+        if not self._caminho("conteudo", metadados["hash"]).exists():
+            return None
+        return metadados
+
+    def _salvar_metadados(self, chave: str, metadados: dict):
+        caminho = self._caminho("respostas", f"{chave}.json")
+        _gravar_atomico(caminho, json.dumps(metadados).encode())
+
+    def _resposta(self, metadados: dict, origem: str, alterado: bool):
+        conteudo = self._caminho("conteudo", metadados["hash"]).read_bytes()
+        return RespostaEmCache(
+            conteudo, metadados["encoding"], metadados["hash"], origem, alterado
+        )
+
+    def buscar(
+        self,
+        cliente: ClienteHttp,
+        metodo: str,
+        url: str,
+        data: dict | None = None,
+        aceitar: Callable[[str], bool] | None = None,
+        host: str | None = None,
+    ) -> RespostaEmCache:
+        """Devolve a resposta do cache, se ainda válida; senão, revalida ou baixa
+        de novo pelo cliente. Respostas cujo texto é recusado por `aceitar` (por
+        exemplo, um arquivo ainda não publicado) são devolvidas sem ir para o
+        cache. host
+        escolhe o TTL e o limite de taxa (padrão: o servidor da URL)."""
+
+        chave = self._chave(metodo, url, data)
+        metadados = self._ler_metadados(chave)
+        host = host or urlsplit(url).hostname
+        if metadados and time.time() - metadados["salvo_em"] < self._ttl(host):
+            return self._resposta(metadados, "cache", alterado=False)
+
+        cabecalhos = {}
+        if metadados and metadados.get("etag"):
+            cabecalhos["If-None-Match"] = metadados["etag"]
+        if metadados and metadados.get("last_modified"):
+            cabecalhos["If-Modified-Since"] = metadados["last_modified"]
+
+        resposta = cliente.requisitar(
+            metodo, url, host=host, data=data, headers=cabecalhos
+        )
+        if resposta.status_code == 304 and metadados:
+            metadados["salvo_em"] = time.time()
+            self._salvar_metadados(chave, metadados)
+            return self._resposta(metadados, "revalidada", alterado=False)
+
+        conteudo = resposta.content
+        hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+        encoding = resposta.encoding or resposta.apparent_encoding or "utf-8"
+        resposta_nova = RespostaEmCache(
+            conteudo, encoding, hash_conteudo, "rede", alterado=True
+        )
+        if aceitar is not None and not aceitar(resposta_nova.texto):
+            return resposta_nova
+
+        caminho_conteudo = self._caminho("conteudo", hash_conteudo)
+        if not caminho_conteudo.exists():
+            _gravar_atomico(caminho_conteudo, conteudo)
+
+        alterado = metadados is None or metadados["hash"] != hash_conteudo
+        metadados = {
+            "url": url,
+            "hash": hash_conteudo,
+            "encoding": encoding,
+            "etag": resposta.headers.get("ETag"),
+            "last_modified": resposta.headers.get("Last-Modified"),
+            "salvo_em": time.time(),
+        }
+        self._salvar_metadados(chave, metadados)
+        return RespostaEmCache(conteudo, encoding, hash_conteudo, "rede", alterado)
+
+    def processar(self, resposta: RespostaEmCache, funcao: Callable[[str], object]):
+        """Aplica funcao ao texto da resposta, reaproveitando o resultado de uma
+        execução anterior sobre o mesmo conteúdo."""
+
+        nome = f"{resposta.hash}-{funcao.__qualname__}.pkl"
+        caminho = self._caminho("processado", nome)
+        if caminho.exists():
+            return pd.read_pickle(caminho)
+        resultado = funcao(resposta.texto)
+        _gravar_pickle(caminho, resultado)
+        return resultado
+
+    def memorizar(self, chave: str, host: str, funcao: Callable[[], object]):
+        """Guarda o resultado de funcao pelo TTL do servidor. Para fontes acessadas
+        por bibliotecas com HTTP próprio (yfinance), sem revalidação."""
+
+        nome = hashlib.sha256(chave.encode()).hexdigest()
+        caminho = self._caminho("memorizado", f"{nome}.pkl")
+        if caminho.exists() and time.time() - caminho.stat().st_mtime < self._ttl(host):
+            return pd.read_pickle(caminho)
+        resultado = funcao()
+        # Resultado vazio costuma ser falha da fonte; não vale guardar
+        if not getattr(resultado, "empty", False):
+            _gravar_pickle(caminho, resultado)
+        return resultado
+
+
+# Cache usado por todos os indicadores
+CACHE = CacheRespostas()
@@ -0,0 +1,236 @@
+"""
+Cliente HTTP compartilhado pelos indicadores.
+
+Todas as requisições passam por uma única sessão do requests, então as conexões
+TCP/TLS são reaproveitadas entre chamadas e entre threads. Cada servidor tem um
+balde de tokens que limita a taxa de requisições, e falhas transitórias (erros
+de conexão, timeouts e respostas 429/5xx) são repetidas com espera exponencial.
+O cliente conta requisições, bytes e latência por servidor.
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+T = TypeVar("T")
+
+# Requisições por segundo permitidas em cada servidor. Servidores fora da lista
+# usam TAXA_PADRAO.
+TAXAS_POR_HOST = {
+    "www.anbima.com.br": 2.0,
+    "www.portaldefinancas.com": 1.0,
+    "query2.finance.yahoo.com": 5.0,
+}
+TAXA_PADRAO = 5.0
+
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+
+class BaldeDeTokens:
+    """Libera `taxa` requisições por segundo, com rajadas de até `capacidade`.
+    Cada requisição consome um token; sem token disponível, a thread espera o
+    próximo ser reposto."""
+
+    def __init__(self, taxa: float, capacidade: float = 1.0):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.atualizado = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consumir(self) -> float:
+        """Aguarda um token. Retorna o tempo de espera, em segundos."""
+
+        with self.lock:
+            agora = time.monotonic()
+            self.tokens = min(
+                self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa
+            )
+            self.atualizado = agora
+            # O token é reservado já aqui, mesmo que ainda falte, para que as
+            # threads seguintes esperem depois desta
+            self.tokens -= 1
+            espera = -self.tokens / self.taxa if self.tokens < 0 else 0.0
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+
+@dataclass
+class Estatisticas:
+    requisicoes: int = 0
+    repeticoes: int = 0
+    falhas: int = 0
+    bytes: int = 0
+    latencia: float = 0.0  # soma, em segundos
+    espera: float = 0.0  # soma da espera por tokens, em segundos
+
+
+class ClienteHttp:
+    def __init__(
+        self,
+        tentativas: int = 4,
+        espera_inicial: float = 0.5,
+        espera_maxima: float = 8.0,
+        timeout: float = 30.0,
+        conexoes_por_host: int = 8,
+        taxas_por_host: dict[str, float] | None = None,
+    ):
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.timeout = timeout
+        if taxas_por_host is None:
+            taxas_por_host = TAXAS_POR_HOST
+        self.taxas_por_host = taxas_por_host
+
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(
+            pool_connections=len(self.taxas_por_host) + 1,
+            pool_maxsize=conexoes_por_host,
+        )
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+
+        # Chamado com (método, url, dados, conteúdo, Content-Type) a cada resposta
+        # de sucesso; usado pela gravação de respostas (ver simulacao)
+        self.gravador: Callable[[str, str, dict | None, bytes, str], None] | None = None
+
+        self.baldes: dict[str, BaldeDeTokens] = {}
+        self.estatisticas: dict[str, Estatisticas] = defaultdict(Estatisticas)
+        self.lock = threading.Lock()
+
+    def _balde(self, host: str) -> BaldeDeTokens:
+        with self.lock:
+            if host not in self.baldes:
+                taxa = self.taxas_por_host.get(host, TAXA_PADRAO)
+                self.baldes[host] = BaldeDeTokens(taxa)
+            return self.baldes[host]
+
+    def _espera(self, tentativa: int) -> float:
+        # Espera exponencial com jitter, para que threads que falharam juntas
+        # não tentem de novo ao mesmo tempo
+        espera = min(self.espera_maxima, self.espera_inicial * 2**tentativa)
+        return espera * random.uniform(0.5, 1.0)
+
+    def executar(
+        self,
+        host: str,
+        funcao: Callable[[], T],
+        repetir: Callable[[Exception], bool] | None = None,
+        tamanho: Callable[[T], int] | None = None,
+    ) -> T:
+        """Chama funcao respeitando a taxa do servidor e repetindo as falhas
+        transitórias. Serve também para bibliotecas que fazem as próprias
+        requisições, como o yfinance. `repetir` decide se uma exceção deve ser
+        repetida (padrão: todas) e `tamanho` mede a resposta, para a contagem de
+        bytes."""
+
+        balde = self._balde(host)
+        for tentativa in range(self.tentativas):
+            espera = balde.consumir()
+            inicio = time.perf_counter()
+            try:
+                resultado = funcao()
+            except Exception as erro:
+                latencia = time.perf_counter() - inicio
+                ultima = tentativa == self.tentativas - 1
+                if ultima or (repetir is not None and not repetir(erro)):
+                    with self.lock:
+                        self._contar(host, espera, latencia, 0, falha=True)
+                    raise
+                with self.lock:
+                    self._contar(host, espera, latencia, 0, repeticao=True)
+                time.sleep(self._espera(tentativa))
+                continue
+
+            latencia = time.perf_counter() - inicio
+            medido = tamanho(resultado) if tamanho else 0
+            with self.lock:
+                self._contar(host, espera, latencia, medido)
+            return resultado
+
+    def _contar(
+        self,
+        host: str,
+        espera: float,
+        latencia: float,
+        tamanho: int,
+        repeticao: bool = False,
+        falha: bool = False,
+    ):
+        estatisticas = self.estatisticas[host]
+        estatisticas.requisicoes += 1
+        estatisticas.repeticoes += repeticao
+        estatisticas.falhas += falha
+        estatisticas.bytes += tamanho
+        estatisticas.latencia += latencia
+        estatisticas.espera += espera
+
+    def requisitar(
+        self, metodo: str, url: str, host: str | None = None, **kwargs
+    ) -> requests.Response:
+        """Faz a requisição pela sessão compartilhada. Levanta HTTPError se a
+        resposta final não for de sucesso. host define o limite de taxa e as
+        estatísticas usados (padrão: o servidor da URL), o que mantém os limites
+        de cada fonte quando elas apontam para o servidor local."""
+
+        kwargs.setdefault("timeout", self.timeout)
+
+        def enviar() -> requests.Response:
+            resposta = self.sessao.request(metodo, url, **kwargs)
+            resposta.raise_for_status()
+            return resposta
+
+        resposta = self.executar(
+            host or urlsplit(url).hostname,
+            enviar,
+            repetir=_repetivel,
+            tamanho=lambda resposta: len(resposta.content),
+        )
+        if self.gravador is not None and resposta.status_code == 200:
+            self.gravador(
+                metodo,
+                url,
+                kwargs.get("data"),
+                resposta.content,
+                resposta.headers.get("Content-Type", ""),
+            )
+        return resposta
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.requisitar("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.requisitar("POST", url, **kwargs)
+
+    def imprimir_estatisticas(self):
+        if not self.estatisticas:
+            return
+        cabecalho = ("Servidor", "Req.", "Repet.", "Falhas", "KiB", "Lat.", "Espera")
+        print("\n{:<26} {:>5} {:>6} {:>6} {:>8} {:>9} {:>8}".format(*cabecalho))
+        for host, e in sorted(self.estatisticas.items()):
+            media = e.latencia / e.requisicoes if e.requisicoes else 0.0
+            print(
+                f"{host:<26} {e.requisicoes:>5} {e.repeticoes:>6} {e.falhas:>6} "
+                f"{e.bytes / 1024:>8.1f} {media:>8.3f}s {e.espera:>7.2f}s"
+            )
+
+
+def _repetivel(erro: Exception) -> bool:
+    if isinstance(erro, requests.HTTPError):
+        return erro.response is not None and (
+            erro.response.status_code in STATUS_REPETIVEIS
+        )
+    return isinstance(erro, (requests.ConnectionError, requests.Timeout))
+
+
+# Cliente usado por todos os indicadores
+CLIENTE = ClienteHttp()
@@ -1,99 +1,203 @@
 import re
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
 from io import StringIO
 from abc import ABC, abstractmethod
-import time
+from urllib.parse import urlencode, urlsplit, urlunsplit
+from zoneinfo import ZoneInfo
 
 import requests
 import pandas as pd
 import yfinance as yf
 
+from src.cotacoes.cache_http import CACHE, CacheRespostas
+from src.cotacoes.cliente_http import CLIENTE, ClienteHttp
+from src.utils.calendario import (
+    CALENDARIO_PREGAO,
+    dia_util_anterior,
+    dias_uteis_no_intervalo,
+)
+
 
 class IndicadorAbstrato(ABC):
+    # Servidor de onde os dados vêm, usado para limitar as requisições simultâneas
+    host: str = ""
+    # Cliente HTTP compartilhado: pool de conexões, repetições e limite de taxa
+    cliente: ClienteHttp = CLIENTE
+    # Cache em disco das respostas, com validade por servidor
+    cache: CacheRespostas = CACHE
+    # Endereço (esquema e servidor) que substitui o das fontes reais, para buscar
+    # de um servidor local que reproduz respostas gravadas (ver simulacao)
+    url_base: str | None = None
+    # Último dia das séries baixadas (padrão: hoje). Fixado ao gravar e ao repetir
+    # uma atualização, para que as requisições sejam as mesmas (ver simulacao)
+    data_fim: date | None = None
+
+    @classmethod
+    def endereco(cls, url: str) -> str:
+        if cls.url_base is None:
+            return url
+        partes = urlsplit(url)
+        return cls.url_base.rstrip("/") + urlunsplit(("", "", *partes[2:]))
+
     @abstractmethod
     def extrair(self, data: date) -> float:
         pass
 
+    def extrair_datas(self, datas: list[date]) -> pd.Series:
+        """Valores de várias datas, indexados pela data. Datas sem valor ficam de
+        fora. As subclasses podem sobrescrever para buscar tudo de uma vez."""
+        valores = pd.Series({data: self.extrair(data) for data in datas}, dtype=float)
+        return valores.dropna()
 
-class IMAB5(IndicadorAbstrato):
-    def extrair(self, data: date) -> float:
-        time.sleep(1)
-        resposta = requests.post(
-            "https://www.anbima.com.br/informacoes/ima/ima-sh-down.asp",
-            data={
-                "Tipo": "",
-                "DataRef": "",
-                "Pai": "ima",
-                "escolha": "2",
-                "Idioma": "PT",
-                "saida": "csv",
-                "Dt_Ref_Ver": "20240308",
-                "Dt_Ref": data.strftime("%d/%m/%Y"),
-            },
-        )
-        resposta.raise_for_status()
+    def extrair_intervalo(self, inicio: date, fim: date) -> pd.Series:
+        """Valores de todos os dias úteis entre as datas, inclusive."""
+        return self.extrair_datas(dias_uteis_no_intervalo(inicio, fim))
+
+
+class _IndicadorAnbima(IndicadorAbstrato):
+    """Indicadores baixados dos arquivos diários da ANBIMA. Os endpoints aceitam
+    uma única data de referência, então as datas de um intervalo são pedidas em
+    paralelo, sob o limite de taxa do cliente HTTP para o servidor da ANBIMA. As
+    respostas são juntadas e lidas com um único read_csv."""
+
+    host = "www.anbima.com.br"
+    requisicoes_simultaneas = 4
+
+    url: str
+    # Linhas antes do cabeçalho do CSV
+    linhas_ignoradas: int
+    # Linha com o valor: coluna_filtro == valor_filtro
+    coluna_filtro: str
+    valor_filtro: str
+    coluna_valor: str
+
+    @abstractmethod
+    def formulario(self, data: date) -> dict[str, str]:
+        pass
 
+    def baixar(self, data: date) -> str | None:
+        """Baixa o arquivo de uma data. Uma data que continua falhando depois das
+        repetições do cliente fica sem valor, sem derrubar as demais."""
         try:
-            df = pd.read_csv(
-                StringIO(resposta.text),
-                sep=";",
-                decimal=",",
-                encoding="latin1",
-                thousands=".",
-                skiprows=1,
-                usecols=["Índice", "Data de Referência", "Número Índice"],
-                date_format="%d/%m/%Y",
-                parse_dates=["Data de Referência"],
+            resposta = self.cache.buscar(
+                self.cliente,
+                "POST",
+                self.endereco(self.url),
+                data=self.formulario(data),
+                # Só guarda os arquivos já publicados. A comparação é feita no
+                # texto decodificado, pois a ANBIMA responde em latin1
+                aceitar=lambda texto: self.coluna_valor in texto,
+                host=self.host,
             )
-        except Exception:
+            return resposta.texto
+        except requests.RequestException as erro:
+            print(f"{type(self).__name__}: erro ao baixar {data} ({erro}).")
             return None
 
-        imab5 = df.loc[df["Índice"].eq("IMA-B 5"), "Número Índice"].iloc[0]
-        return float(imab5)
+    def extrair(self, data: date) -> float:
+        return self.extrair_datas([data]).get(data)
 
+    def extrair_datas(self, datas: list[date]) -> pd.Series:
+        with ThreadPoolExecutor(max_workers=self.requisicoes_simultaneas) as executor:
+            textos = dict(zip(datas, executor.map(self.baixar, datas)))
+        return self.ler_respostas(textos)
 
-class VNA(IndicadorAbstrato):
-    def extrair(self, data: date) -> float:
-        time.sleep(1)
-        resposta = requests.post(
-            "https://www.anbima.com.br/informacoes/vna/vna-down.asp",
-            data={
-                "Data": data.strftime("%d%m%Y"),
-                "escolha": "2",
-                "Idioma": "PT",
-                "saida": "txt",
-                "Dt_Ref_Ver": "20240422",
-                "Inicio": data.strftime("%d/%m/%Y"),
-            },
+    def ler_respostas(self, textos: dict[date, str]) -> pd.Series:
+        """Junta as respostas num único CSV, com a data da consulta na primeira
+        coluna, e lê tudo de uma vez. Respostas sem a tabela esperada (dias sem
+        divulgação, páginas de erro) são descartadas."""
+
+        cabecalho = None
+        linhas = []
+        for data, texto in textos.items():
+            if texto is None:
+                continue
+            corpo = texto.splitlines()[self.linhas_ignoradas:]
+            if not corpo or self.coluna_valor not in corpo[0]:
+                continue
+            cabecalho = cabecalho or corpo[0]
+            linhas += [f"{data.isoformat()};{linha}" for linha in corpo[1:] if linha]
+
+        if not linhas:
+            return pd.Series(dtype=float)
+
+        df = pd.read_csv(
+            StringIO("\n".join([f"Data da consulta;{cabecalho}", *linhas])),
+            sep=";",
+            decimal=",",
+            thousands=".",
+            usecols=["Data da consulta", self.coluna_filtro, self.coluna_valor],
         )
-        resposta.raise_for_status()
+        df = df.loc[df[self.coluna_filtro].eq(self.valor_filtro)]
+        df = df.drop_duplicates("Data da consulta")
+        datas = pd.to_datetime(df["Data da consulta"]).dt.date
+        return pd.Series(df[self.coluna_valor].astype(float).to_numpy(), index=datas)
 
-        try:
-            df = pd.read_csv(
-                StringIO(resposta.text),
-                sep=";",
-                decimal=",",
-                encoding="latin1",
-                thousands=".",
-                skiprows=7,
-            )
-        except Exception:
-            return None
 
-        vna = df.loc[df["Titulo"].eq("NTN-B"), "VNA"].iloc[0]
-        return float(vna)
+class IMAB5(_IndicadorAnbima):
+    url = "https://www.anbima.com.br/informacoes/ima/ima-sh-down.asp"
+    linhas_ignoradas = 1
+    coluna_filtro = "Índice"
+    valor_filtro = "IMA-B 5"
+    coluna_valor = "Número Índice"
+
+    def formulario(self, data: date) -> dict[str, str]:
+        return {
+            "Tipo": "",
+            "DataRef": "",
+            "Pai": "ima",
+            "escolha": "2",
+            "Idioma": "PT",
+            "saida": "csv",
+            "Dt_Ref_Ver": "20240308",
+            "Dt_Ref": data.strftime("%d/%m/%Y"),
+        }
+
+
+class VNA(_IndicadorAnbima):
+    url = "https://www.anbima.com.br/informacoes/vna/vna-down.asp"
+    linhas_ignoradas = 7
+    coluna_filtro = "Titulo"
+    valor_filtro = "NTN-B"
+    coluna_valor = "VNA"
+
+    def formulario(self, data: date) -> dict[str, str]:
+        return {
+            "Data": data.strftime("%d%m%Y"),
+            "escolha": "2",
+            "Idioma": "PT",
+            "saida": "txt",
+            "Dt_Ref_Ver": "20240422",
+            "Inicio": data.strftime("%d/%m/%Y"),
+        }
 
 
 class CDI(IndicadorAbstrato):
+    host = "www.portaldefinancas.com"
+
     def __init__(self):
-        self.serie = self.baixar_serie()
+        self._serie = None
+
+    @property
+    def serie(self) -> pd.Series:
+        """Série completa, baixada apenas no primeiro uso."""
+        if self._serie is None:
+            self._serie = self.baixar_serie()
+        return self._serie
 
     def baixar_serie(self) -> pd.Series:
-        resposta = requests.get("https://www.portaldefinancas.com/js-tx/cdidiaria.js")
-        resposta.raise_for_status()
+        url = "https://www.portaldefinancas.com/js-tx/cdidiaria.js"
+        resposta = self.cache.buscar(
+            self.cliente, "GET", self.endereco(url), host=self.host
+        )
+        # Se a página não mudou desde a última leitura, a série já está no cache
+        return self.cache.processar(resposta, self.ler_pagina)
 
+    @staticmethod
+    def ler_pagina(texto: str) -> pd.Series:
         regex = re.compile(r"document\.write\('(<.+>)'\);")
-        html_bruto = regex.search(resposta.text).group(1)
+        html_bruto = regex.search(texto).group(1)
 
         # Adicionando tag <table> no começo para permitir leitura do pandas
         # sem erros
@@ -123,14 +227,49 @@ class CDI(IndicadorAbstrato):
         except KeyError:
             return None
 
+    def extrair_datas(self, datas: list[date]) -> pd.Series:
+        return self.serie.reindex(datas).dropna()
+
+    def extrair_intervalo(self, inicio: date, fim: date) -> pd.Series:
+        return self.serie.loc[inicio:fim]
+
 
 class TickerBolsa(IndicadorAbstrato):
+    host = "query2.finance.yahoo.com"
+    # Horário, em Brasília, a partir do qual o fechamento do pregão já deve estar
+    # no Yahoo (o pregão termina às 17h ou às 18h, conforme o horário de verão
+    # americano)
+    horario_fechamento = time(19, 0)
+    fuso = ZoneInfo("America/Sao_Paulo")
+
     def __init__(self, ticker: str):
         self.ticker = ticker
-        self.serie = self.baixar_serie()
+        self._serie = None
+
+    @property
+    def serie(self) -> pd.Series:
+        """Série do último ano, baixada apenas no primeiro uso."""
+        if self._serie is None:
+            self._serie = self.baixar_serie()
+        return self._serie
 
     def baixar_serie(self, history_period: str = "1y") -> pd.Series:
-        cotacoes = yf.Ticker(self.ticker).history(history_period, rounding=True)
+        if self.url_base is not None or self.cliente.gravador is not None:
+            # O servidor local só reproduz as buscas em lote, então a gravação
+            # também passa por elas, com o início calculado a partir de data_fim
+            inicio = (self.data_fim or date.today()) - timedelta(days=365)
+            return self.baixar_lote([self.ticker], inicio)[self.ticker].dropna()
+
+        # O yfinance faz as próprias requisições; o cliente só aplica o limite de
+        # taxa, as repetições e a contagem
+        cotacoes = self.cache.memorizar(
+            f"yfinance {self.ticker} {history_period} {self.ultimo_fechamento()}",
+            self.host,
+            lambda: self.cliente.executar(
+                self.host,
+                lambda: yf.Ticker(self.ticker).history(history_period, rounding=True),
+            ),
+        )
         cotacoes.index = cotacoes.index.map(lambda x: x.date())
         return cotacoes["Close"]
 
@@ -139,3 +278,82 @@ class TickerBolsa(IndicadorAbstrato):
             return self.serie.loc[data]
         except KeyError:
             return None
+
+    def extrair_datas(self, datas: list[date]) -> pd.Series:
+        return self.serie.reindex(datas).dropna()
+
+    def extrair_intervalo(self, inicio: date, fim: date) -> pd.Series:
+        return self.serie.loc[inicio:fim]
+
+    @classmethod
+    def ultimo_fechamento(cls) -> date:
+        """Último pregão cujo fechamento já deve estar publicado. Faz parte da
+        chave do cache, para que um resultado baixado antes do fechamento não
+        seja reaproveitado depois dele."""
+        agora = datetime.now(cls.fuso)
+        return dia_util_anterior(
+            agora.date(),
+            incluir_data=agora.time() >= cls.horario_fechamento,
+            calendario=CALENDARIO_PREGAO,
+        )
+
+    # Caminho, no servidor local, dos fechamentos em lote gravados do yfinance
+    CAMINHO_LOTE = "/yfinance/fechamentos"
+
+    @classmethod
+    def baixar_lote(cls, tickers: list[str], inicio: date) -> pd.DataFrame:
+        """Fechamentos de vários tickers, desde inicio, numa única chamada ao
+        yfinance. Uma coluna por ticker, indexado pela data. Tickers sem
+        negociação no período ficam com NaN."""
+
+        tickers = sorted(tickers)
+        if cls.url_base is not None:
+            return cls._baixar_lote_local(tickers, inicio)
+
+        cotacoes = cls.cache.memorizar(
+            f"yfinance {' '.join(tickers)} {inicio} {cls.ultimo_fechamento()}",
+            cls.host,
+            lambda: cls.cliente.executar(
+                cls.host,
+                lambda: yf.download(
+                    tickers,
+                    start=inicio,
+                    auto_adjust=True,
+                    group_by="column",
+                    progress=False,
+                ),
+            ),
+        )
+        fechamentos = cotacoes["Close"]
+        # Versões antigas do yfinance não criam o nível do ticker quando há um só
+        if isinstance(fechamentos, pd.Series):
+            fechamentos = fechamentos.to_frame(tickers[0])
+        fechamentos = fechamentos.reindex(columns=tickers).round(2)
+        fechamentos.index = fechamentos.index.map(lambda x: x.date())
+
+        if cls.cliente.gravador is not None:
+            # O yfinance não passa pelo cliente; a gravação recebe o resultado
+            # como se fosse a resposta do servidor local
+            cls.cliente.gravador(
+                "GET",
+                cls._url_lote(tickers, inicio),
+                None,
+                fechamentos.to_csv().encode(),
+                "text/csv; charset=utf-8",
+            )
+        return fechamentos
+
+    @classmethod
+    def _url_lote(cls, tickers: list[str], inicio: date) -> str:
+        consulta = urlencode(
+            {"inicio": inicio.isoformat(), "tickers": ",".join(tickers)}
+        )
+        return f"https://{cls.host}{cls.CAMINHO_LOTE}?{consulta}"
+
+    @classmethod
+    def _baixar_lote_local(cls, tickers: list[str], inicio: date) -> pd.DataFrame:
+        url = cls.endereco(cls._url_lote(tickers, inicio))
+        resposta = cls.cache.buscar(cls.cliente, "GET", url, host=cls.host)
+        fechamentos = pd.read_csv(StringIO(resposta.texto), index_col=0)
+        fechamentos.index = pd.to_datetime(fechamentos.index).date
+        return fechamentos.reindex(columns=tickers)
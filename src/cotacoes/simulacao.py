@@ -0,0 +1,367 @@
+"""
+Gravação e reprodução das respostas das fontes de cotações, para medir e testar
+a atualização sem acesso às fontes reais.
+
+Uso:
+    python -m src.cotacoes.simulacao gravar [--dias 30]
+    python -m src.cotacoes.simulacao servir [--porta 8765] [--latencia 0.2]
+        [--taxa-erro 0.05] [--semente 0]
+    python -m src.cotacoes.simulacao medir [--latencia 0.2] [--taxa-erro 0.05]
+        [--semente 0] [--limite-por-host 2] [--sem-limite-de-taxa]
+
+gravar: copia o banco para dados/gravacoes/banco.db, apaga as cotações dos
+últimos dias e roda a atualização contra as fontes reais, gravando cada
+resposta (ANBIMA, página do CDI e os fechamentos em lote do yfinance) em
+dados/gravacoes/.
+
+servir: sobe um servidor HTTP local que responde com as gravações, com latência
+e taxa de erros (503) configuráveis. As requisições são reconhecidas pelo
+método, caminho e parâmetros, independentemente do servidor original. O sorteio
+da latência e dos erros depende só da semente, da requisição e de quantas vezes
+ela já foi feita, então a mesma execução se repete igual.
+
+medir: sobe o servidor local, aponta IMAB5, VNA, CDI e TickerBolsa para ele e
+repete a atualização gravada numa cópia de banco.db, com a mesma data final,
+imprimindo os tempos e as estatísticas do cliente HTTP.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import src.database.database as database
+from src.cotacoes.atualiza_cotacoes import LIMITE_POR_HOST, atualizar_indicadores
+from src.cotacoes.cache_http import CacheRespostas
+from src.cotacoes.cliente_http import ClienteHttp
+from src.cotacoes.indicadores import IndicadorAbstrato
+from src.database.database import (
+    CAMINHO_DADOS,
+    criar_tabelas,
+    fechar_conexoes,
+    remover_cotacoes_desde,
+)
+
+CAMINHO_GRAVACOES = CAMINHO_DADOS / "gravacoes"
+
+
+# ---------------------------------------------------------------------------
+# Gravações
+# ---------------------------------------------------------------------------
+
+
+def chave_requisicao(metodo: str, caminho: str, consulta: str, corpo: str) -> str:
+    """Identifica uma requisição pelo método, caminho e parâmetros da URL e do
+    formulário, em ordem alfabética. O servidor fica de fora, para que uma
+    resposta gravada da fonte real seja encontrada pelo servidor local."""
+
+    partes = [metodo.upper(), caminho]
+    for parametros in (consulta, corpo):
+        partes.append(urlencode(sorted(parse_qsl(parametros, keep_blank_values=True))))
+    return hashlib.sha256("\n".join(partes).encode()).hexdigest()
+
+
+class Gravacoes:
+    def __init__(self, diretorio: Path = CAMINHO_GRAVACOES):
+        self.diretorio = diretorio
+        self.banco = diretorio / "banco.db"
+        self.manifesto = diretorio / "manifesto.json"
+
+    def salvar(
+        self,
+        metodo: str,
+        url: str,
+        dados: dict | None,
+        conteudo: bytes,
+        tipo_conteudo: str,
+    ):
+        """Grava uma resposta. Tem a assinatura de ClienteHttp.gravador."""
+
+        partes = urlsplit(url)
+        corpo = urlencode(dados or {})
+        chave = chave_requisicao(metodo, partes.path, partes.query, corpo)
+        pasta = self.diretorio / "respostas"
+        pasta.mkdir(parents=True, exist_ok=True)
+        (pasta / f"{chave}.bin").write_bytes(conteudo)
+        descricao = {"url": url, "dados": dados, "tipo": tipo_conteudo}
+        (pasta / f"{chave}.json").write_text(json.dumps(descricao))
+
+    def ler(self, chave: str) -> tuple[bytes, str] | None:
+        pasta = self.diretorio / "respostas"
+        try:
+            descricao = json.loads((pasta / f"{chave}.json").read_text())
+            return (pasta / f"{chave}.bin").read_bytes(), descricao["tipo"]
+        except FileNotFoundError:
+            return None
+
+    def salvar_manifesto(self, data_fim: date, dias: int):
+        self.manifesto.write_text(
+            json.dumps({"data_fim": data_fim.isoformat(), "dias": dias})
+        )
+
+    def ler_manifesto(self) -> tuple[date, int]:
+        manifesto = json.loads(self.manifesto.read_text())
+        return date.fromisoformat(manifesto["data_fim"]), manifesto["dias"]
+
+
+# ---------------------------------------------------------------------------
+# Servidor local
+# ---------------------------------------------------------------------------
+
+
+class ServidorLocal(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        gravacoes: Gravacoes,
+        porta: int = 0,
+        latencia: float = 0.0,
+        variacao_latencia: float = 0.5,
+        taxa_erro: float = 0.0,
+        semente: int = 0,
+    ):
+        super().__init__(("127.0.0.1", porta), _Manipulador)
+        self.gravacoes = gravacoes
+        self.latencia = latencia
+        self.variacao_latencia = variacao_latencia
+        self.taxa_erro = taxa_erro
+        self.semente = semente
+        self.vezes = Counter()
+        self.respostas = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def sorteio(self, chave: str) -> random.Random:
+        """Gerador da n-ésima vez em que a requisição é feita. Não depende da
+        ordem em que as threads chegam ao servidor."""
+        with self.lock:
+            vez = self.vezes[chave]
+            self.vezes[chave] += 1
+        return random.Random(f"{self.semente}:{chave}:{vez}")
+
+    def contar(self, status: int):
+        with self.lock:
+            self.respostas[status] += 1
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    # Mantém a conexão aberta entre requisições, como as fontes reais
+    protocol_version = "HTTP/1.1"
+    server: ServidorLocal
+
+    def do_GET(self):
+        self._responder("GET")
+
+    def do_POST(self):
+        self._responder("POST")
+
+    def _responder(self, metodo: str):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        corpo = self.rfile.read(tamanho).decode("latin-1")
+        partes = urlsplit(self.path)
+        chave = chave_requisicao(metodo, partes.path, partes.query, corpo)
+
+        servidor = self.server
+        sorteio = servidor.sorteio(chave)
+        variacao = servidor.variacao_latencia
+        time.sleep(servidor.latencia * sorteio.uniform(1 - variacao, 1 + variacao))
+        if sorteio.random() < servidor.taxa_erro:
+            self._enviar(503, b"erro simulado", "text/plain")
+            return
+
+        gravada = servidor.gravacoes.ler(chave)
+        if gravada is None:
+            self._enviar(404, b"requisicao nao gravada", "text/plain")
+            return
+
+        conteudo, tipo = gravada
+        etag = f'"{hashlib.sha256(conteudo).hexdigest()[:32]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self._enviar(304, b"", tipo, etag)
+        else:
+            self._enviar(200, conteudo, tipo, etag)
+
+    def _enviar(self, status: int, conteudo: bytes, tipo: str, etag: str | None = None):
+        self.server.contar(status)
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(conteudo)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def log_message(self, *args):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Execuções
+# ---------------------------------------------------------------------------
+
+
+def _copiar_banco(origem: Path, destino: Path):
+    destino.unlink(missing_ok=True)
+    conn_origem = sqlite3.connect(origem)
+    copia = sqlite3.connect(destino)
+    try:
+        conn_origem.backup(copia)
+    finally:
+        copia.close()
+        conn_origem.close()
+
+
+@contextmanager
+def _usando_banco(caminho: Path):
+    """Faz o módulo database usar outro arquivo de banco durante o bloco."""
+    anterior = database.CAMINHO_DB
+    fechar_conexoes()
+    database.CAMINHO_DB = caminho
+    try:
+        yield
+    finally:
+        fechar_conexoes()
+        database.CAMINHO_DB = anterior
+
+
+@contextmanager
+def _indicadores_configurados(**atributos):
+    """Troca atributos de IndicadorAbstrato (cliente, cache, url_base, data_fim)
+    durante o bloco. O cache sempre começa vazio, para que toda busca chegue ao
+    servidor."""
+    anteriores = {nome: getattr(IndicadorAbstrato, nome) for nome in atributos}
+    with tempfile.TemporaryDirectory() as pasta_cache:
+        atributos.setdefault("cache", CacheRespostas(Path(pasta_cache)))
+        anteriores.setdefault("cache", IndicadorAbstrato.cache)
+        for nome, valor in atributos.items():
+            setattr(IndicadorAbstrato, nome, valor)
+        try:
+            yield
+        finally:
+            for nome, valor in anteriores.items():
+                setattr(IndicadorAbstrato, nome, valor)
+
+
+def gravar(dias: int = 30, gravacoes: Gravacoes | None = None):
+    gravacoes = gravacoes or Gravacoes()
+    if gravacoes.diretorio.exists():
+        shutil.rmtree(gravacoes.diretorio)
+    gravacoes.diretorio.mkdir(parents=True)
+
+    data_fim = date.today()
+    fechar_conexoes()
+    _copiar_banco(database.CAMINHO_DB, gravacoes.banco)
+    with _usando_banco(gravacoes.banco):
+        criar_tabelas()
+        removidas = remover_cotacoes_desde(data_fim - timedelta(days=dias))
+    print(f"{removidas} cotações dos últimos {dias} dias removidas da cópia.")
+    gravacoes.salvar_manifesto(data_fim, dias)
+
+    cliente = ClienteHttp()
+    cliente.gravador = gravacoes.salvar
+    with tempfile.TemporaryDirectory() as pasta:
+        trabalho = Path(pasta) / "banco.db"
+        _copiar_banco(gravacoes.banco, trabalho)
+        with _usando_banco(trabalho), _indicadores_configurados(
+            cliente=cliente, data_fim=data_fim
+        ):
+            atualizar_indicadores(dias, incluir_indisponiveis=True, data_fim=data_fim)
+
+    respostas = len(list((gravacoes.diretorio / "respostas").glob("*.bin")))
+    print(f"\n{respostas} respostas gravadas em {gravacoes.diretorio}")
+
+
+def medir(
+    servidor: ServidorLocal,
+    limite_por_host: int = LIMITE_POR_HOST,
+    sem_limite_de_taxa: bool = False,
+):
+    data_fim, dias = servidor.gravacoes.ler_manifesto()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    # Cliente novo, para que as estatísticas sejam só desta execução
+    taxas = None
+    if sem_limite_de_taxa:
+        taxas = {host: 1e9 for host in ClienteHttp().taxas_por_host}
+    cliente = ClienteHttp(taxas_por_host=taxas)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        trabalho = Path(pasta) / "banco.db"
+        _copiar_banco(servidor.gravacoes.banco, trabalho)
+        with _usando_banco(trabalho), _indicadores_configurados(
+            cliente=cliente, url_base=servidor.url, data_fim=data_fim
+        ):
+            atualizar_indicadores(
+                dias,
+                limite_por_host=limite_por_host,
+                incluir_indisponiveis=True,
+                data_fim=data_fim,
+            )
+    servidor.shutdown()
+
+    respostas = ", ".join(f"{n}x {s}" for s, n in sorted(servidor.respostas.items()))
+    print(f"\nServidor local: {respostas}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    parser_gravar = comandos.add_parser("gravar", help="grava as respostas reais")
+    parser_gravar.add_argument(
+        "--dias", type=int, default=30, help="janela apagada e buscada (padrão: 30)"
+    )
+
+    parser_servir = comandos.add_parser("servir", help="sobe o servidor local")
+    parser_servir.add_argument("--porta", type=int, default=8765)
+    parser_medir = comandos.add_parser("medir", help="repete a atualização gravada")
+    parser_medir.add_argument("--limite-por-host", type=int, default=LIMITE_POR_HOST)
+    parser_medir.add_argument(
+        "--sem-limite-de-taxa",
+        action="store_true",
+        help="desliga o limite de requisições por segundo de cada fonte",
+    )
+    for subparser in (parser_servir, parser_medir):
+        subparser.add_argument(
+            "--latencia", type=float, default=0.0, help="segundos por resposta"
+        )
+        subparser.add_argument(
+            "--taxa-erro", type=float, default=0.0, help="fração de respostas 503"
+        )
+        subparser.add_argument("--semente", type=int, default=0)
+
+    argumentos = parser.parse_args()
+    if argumentos.comando == "gravar":
+        gravar(argumentos.dias)
+    else:
+        servidor = ServidorLocal(
+            Gravacoes(),
+            porta=getattr(argumentos, "porta", 0),
+            latencia=argumentos.latencia,
+            taxa_erro=argumentos.taxa_erro,
+            semente=argumentos.semente,
+        )
+        if argumentos.comando == "servir":
+            print(f"Servindo {CAMINHO_GRAVACOES} em {servidor.url}")
+            servidor.serve_forever()
+        else:
+            medir(
+                servidor,
+                argumentos.limite_por_host,
+                argumentos.sem_limite_de_taxa,
+            )
@@ -6,15 +6,106 @@ sys.path.append("..")
 import pandas as pd
 import streamlit as st
 
-from src.consolidacao.consolidacao_carteira import consolidar_carteira
+from src.consolidacao.consolidacao_carteira import carregar_tabelas, tratar_proventos
+from src.consolidacao.consolidacao_fixa import consolidar_renda_fixa
+from src.consolidacao.consolidacao_variavel import consolidar_renda_variavel
+from src.database.database import ler_versoes, usar_conexoes_de_leitura
+from src.utils.calendario import dia_util_anterior
+
+# As páginas só leem por conexões somente leitura. O cadastro grava pela conexão
+# de escrita da sua thread, que é independente destas.
+usar_conexoes_de_leitura()
+
+# Carga da carteira. As tabelas são lidas juntas, numa única transação, sempre
+# que alguma versão muda (tabela versoes do banco). As etapas de consolidação são
+# cacheadas pelas versões das tabelas das quais dependem, então uma escrita só
+# recalcula o que depende da tabela alterada. Apenas a versão mais recente de cada
+# etapa é mantida. Os parâmetros com _ não entram na chave do cache: as tabelas
+# são identificadas pelas versões.
+
+
+@st.cache_resource(max_entries=1)
+def _carregar_tabelas(
+    versoes: tuple[tuple[str, int], ...],
+) -> tuple[dict[str, pd.DataFrame], dict[str, int]]:
+    # versoes é lida fora da transação e só decide quando reler. As etapas usam
+    # as versões retornadas, lidas junto com as tabelas.
+    return carregar_tabelas()
+
+
+@st.cache_resource(max_entries=1)
+def _consolidar_renda_variavel(
+    versao_cotacoes: int | None,
+    versao_aportes_rf: int | None,
+    versao_transacoes_rv: int | None,
+    _tabelas: dict[str, pd.DataFrame],
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    # As janelas de cotações dependem dos aportes e das transações.
+    # consolidar_renda_variavel adiciona colunas às transações.
+    transacoes_rv = _tabelas["transacoes_rv"].copy()
+    patrimonio_rv, carteira_rv = consolidar_renda_variavel(
+        transacoes_rv, _tabelas["cotacoes"]
+    )
+    return transacoes_rv, patrimonio_rv, carteira_rv
+
+
+@st.cache_resource(max_entries=1)
+def _consolidar_renda_fixa(
+    versao_cotacoes: int | None,
+    versao_aportes_rf: int | None,
+    versao_transacoes_rv: int | None,
+    versao_resgates_rf: int | None,
+    _tabelas: dict[str, pd.DataFrame],
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    return consolidar_renda_fixa(
+        _tabelas["aportes_rf"], _tabelas["resgates_rf"], _tabelas["cotacoes"]
+    )
+
+
+@st.cache_resource(max_entries=1)
+def _tratar_proventos(
+    versao_proventos_rv: int | None, _tabelas: dict[str, pd.DataFrame]
+) -> pd.DataFrame:
+    return tratar_proventos(_tabelas["proventos_rv"])
 
 
-@st.cache_resource
 def carregar_dados() -> dict[str, pd.DataFrame]:
-    return consolidar_carteira()
+    """Mesmo resultado de consolidar_carteira, montado a partir das etapas
+    cacheadas."""
+
+    tabelas, versoes = _carregar_tabelas(tuple(sorted(ler_versoes().items())))
+    v_cotacoes = versoes.get("cotacoes")
+    v_aportes = versoes.get("aportes_rf")
+    v_transacoes = versoes.get("transacoes_rv")
 
+    transacoes_rv, patrimonio_rv, carteira_rv = _consolidar_renda_variavel(
+        v_cotacoes, v_aportes, v_transacoes, tabelas
+    )
+    patrimonio_rf, carteira_rf = _consolidar_renda_fixa(
+        v_cotacoes, v_aportes, v_transacoes, versoes.get("resgates_rf"), tabelas
+    )
 
-@st.cache_resource
+    return {
+        "proventos": _tratar_proventos(versoes.get("proventos_rv"), tabelas),
+        "ativos_rv": tabelas["ativos_rv"],
+        "transacoes_rv": transacoes_rv,
+        "patrimonio_rv": patrimonio_rv,
+        "carteira_rv": carteira_rv,
+        "aportes_rf": tabelas["aportes_rf"],
+        "resgates_rf": tabelas["resgates_rf"],
+        "patrimonio_rf": patrimonio_rf,
+        "carteira_rf": carteira_rf,
+        "cotacoes": tabelas["cotacoes"],
+        "proporcoes": tabelas["proporcoes"],
+    }
+
+
+# Cada função guarda só os resultados mais recentes, para que a memória não cresça
+# a cada atualização do banco. As chamadas com mais de uma entrada por página
+# (os cartões de métricas e os filtros de proventos) guardam algumas a mais.
+
+
+@st.cache_resource(max_entries=1)
 def enriquecer_df_renda_fixa(
     carteira_rf: pd.DataFrame, aportes_rf: pd.DataFrame
 ) -> pd.DataFrame:
@@ -23,7 +114,7 @@ def enriquecer_df_renda_fixa(
     return df
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=1)
 def enriquecer_df_renda_var(
     ativos_rv: pd.DataFrame, carteira_rv: pd.DataFrame, proventos: pd.DataFrame
 ) -> pd.DataFrame:
@@ -52,7 +143,7 @@ def obter_resgates_titulo(resgates_rf: pd.DataFrame, id_titulo: int) -> pd.DataF
     return resgates_rf.loc[resgates_rf["id"].eq(id_titulo)]
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=4)
 def agrupar_proventos_por_ativo(proventos: pd.DataFrame) -> pd.DataFrame:
     proventos_ativo = (
         proventos.groupby(["codigo", "tipo_ativo", "preco_medio"])
@@ -71,7 +162,7 @@ def agrupar_proventos_por_ativo(proventos: pd.DataFrame) -> pd.DataFrame:
     return proventos_ativo
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=1)
 def enriquecer_df_proventos(
     proventos: pd.DataFrame, ativos_rv: pd.DataFrame, carteira_rv: pd.DataFrame
 ) -> pd.DataFrame:
@@ -82,7 +173,7 @@ def enriquecer_df_proventos(
     return df
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=1)
 def enriquecer_dfs_carteira(
     ativos_rv: pd.DataFrame,
     aportes_rf: pd.DataFrame,
@@ -146,7 +237,7 @@ def criar_df_rebalanceamento(
     return df.reset_index().drop(columns=["aportes_vals"])
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=1)
 def enriquecer_patrimonio_rf(
     aportes_rf: pd.DataFrame, patrimonio_rf: pd.DataFrame
 ) -> pd.DataFrame:
@@ -155,14 +246,14 @@ def enriquecer_patrimonio_rf(
     )
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=1)
 def enriquecer_patrimonio_rv(
     ativos_rv: pd.DataFrame, patrimonio_rv: pd.DataFrame
 ) -> pd.DataFrame:
     return patrimonio_rv.merge(ativos_rv, on="codigo", how="left")
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=4)
 def calcular_metricas_rend(df: pd.DataFrame, tipo: str) -> pd.DataFrame:
     if tipo == "rv":
         patrimonio = df["patrimonio"].sum()
@@ -178,7 +269,7 @@ def calcular_metricas_rend(df: pd.DataFrame, tipo: str) -> pd.DataFrame:
     return patrimonio, retorno_valor, retorno_porcent, qtd
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=1)
 def calcular_df_patrimonio_total(
     patrimonio_rf: pd.DataFrame, patrimonio_rv: pd.DataFrame
 ) -> pd.DataFrame:
@@ -224,6 +315,22 @@ def calcular_df_patrimonio_total(
         "classe",
     ] = "acoes"
 
+    # A renda variável só tem linhas nos dias de pregão. Nos dias úteis bancários
+    # sem pregão (24/12, 31/12, feriados de São Paulo) vale o saldo do último
+    # pregão; sem isso o total cairia nesses dias e voltaria no pregão seguinte.
+    saldo_rv = patrimonio_rv_agg.pivot_table(
+        index="data", columns="classe", values="saldo", aggfunc="sum"
+    )
+    datas = saldo_rv.index.union(patrimonio_rf_agg["data"].unique())
+    patrimonio_rv_agg = (
+        saldo_rv.reindex(datas)
+        .ffill()
+        .rename_axis(index="data", columns=None)
+        .reset_index()
+        .melt(id_vars="data", var_name="classe", value_name="saldo")
+        .dropna(subset=["saldo"])
+    )
+
     filter_list = ["data", "classe", "saldo"]
     patrimonio_total = pd.concat(
         [patrimonio_rf_agg[filter_list], patrimonio_rv_agg[filter_list]]
@@ -231,7 +338,7 @@ def calcular_df_patrimonio_total(
     return patrimonio_total
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=1)
 def calcular_mov_diaria(
     aportes_rf: pd.DataFrame, resgates_rf: pd.DataFrame, transacoes_rv: pd.DataFrame
 ):
@@ -271,7 +378,7 @@ def calcular_mov_diaria(
     return movimentacoes
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=1)
 def calcular_mov_mensal(mov_diaria: pd.DataFrame) -> pd.DataFrame:
     mov_diaria = mov_diaria.copy()
     mov_diaria["data"] = mov_diaria["data"].dt.to_period("M").dt.to_timestamp()
@@ -281,7 +388,7 @@ def calcular_mov_mensal(mov_diaria: pd.DataFrame) -> pd.DataFrame:
     return mov_mensal
 
 
-@st.cache_resource
+@st.cache_resource(max_entries=1)
 def criar_df_taxas(df_fixa: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     def aliquota_ir(x: int):
         if x <= 180:
@@ -352,13 +459,12 @@ def calcular_metricas_patr(df: pd.DataFrame) -> tuple[float, float, float, float
     retorno_total = patrimonio_atual / saldo.iloc[0] - 1
     retorno_anualizado_total = (1 + retorno_total) ** (252 / saldo.shape[0]) - 1
 
-    dt_ano_anterior = saldo.index[-1] - timedelta(days=365)
-    while True:
-        try:
-            saldo_ano_ant = saldo.loc[dt_ano_anterior]
-            break
-        except KeyError:
-            dt_ano_anterior -= timedelta(days=1)
+    # Saldo no dia útil mais próximo de um ano atrás. O slice cobre o caso em que
+    # esse dia não aparece no histórico, usando o último saldo anterior a ele.
+    dt_ano_anterior = dia_util_anterior(
+        saldo.index[-1] - timedelta(days=365), incluir_data=True
+    )
+    saldo_ano_ant = saldo.loc[:dt_ano_anterior].iloc[-1]
 
     retorno_ultimo_ano = saldo.iloc[-1] / saldo_ano_ant - 1
     return patrimonio_atual, retorno_total, retorno_anualizado_total, retorno_ultimo_ano
@@ -12,14 +12,10 @@ from src.database.database import (
     atualizar_proporcoes,
 )
 from src.dashboard.dados import carregar_dados
+from src.importacao.importa_b3 import importar
 from src.dashboard.formatacao import formatar_dinheiro
 
 
-def limpar_cache():
-    st.cache_data.clear()
-    st.cache_resource.clear()
-
-
 def _tab_aporte_rf(aportes_rf: pd.DataFrame):
     """Aba para cadastro de novos aportes de renda fixa."""
 
@@ -101,7 +97,6 @@ def _tab_aporte_rf(aportes_rf: pd.DataFrame):
         reserva=reserva,
     )
     st.success(f"Aporte cadastrado com ID **{novo_id}**!")
-    limpar_cache()
 
 
 def _tab_resgate_rf(aportes_rf: pd.DataFrame, resgates_rf: pd.DataFrame):
@@ -169,7 +164,6 @@ def _tab_resgate_rf(aportes_rf: pd.DataFrame, resgates_rf: pd.DataFrame):
         f"Resgate de {formatar_dinheiro(valor_resgate)} do aporte "
         f"**{id_resgate}** cadastrado!"
     )
-    limpar_cache()
 
 
 def _tab_transacao_rv(ativos_rv: pd.DataFrame, transacoes_rv: pd.DataFrame):
@@ -240,7 +234,6 @@ def _tab_transacao_rv(ativos_rv: pd.DataFrame, transacoes_rv: pd.DataFrame):
         f"de **{qtd_trans}x {codigo_trans}** "
         f"({formatar_dinheiro(valor_total)}) cadastrada!"
     )
-    limpar_cache()
 
 
 def _tab_provento_rv(ativos_rv: pd.DataFrame, proventos: pd.DataFrame):
@@ -289,7 +282,6 @@ def _tab_provento_rv(ativos_rv: pd.DataFrame, proventos: pd.DataFrame):
         f"Provento de **{codigo_prov}** "
         f"({formatar_dinheiro(qtd_prov * valor_prov)}) cadastrado!"
     )
-    limpar_cache()
 
 
 def _tab_ativo_rv(ativos_rv: pd.DataFrame):
@@ -324,7 +316,6 @@ def _tab_ativo_rv(ativos_rv: pd.DataFrame):
         benchmark=benchmark,
     )
     st.success(f"Ativo **{codigo_ativo.upper()}** cadastrado/atualizado!")
-    limpar_cache()
 
 
 def _tab_proporcoes(proporcoes: pd.DataFrame):
@@ -356,7 +347,41 @@ def _tab_proporcoes(proporcoes: pd.DataFrame):
     novos_valores = dict(zip(editado["classe"], editado["proporcao"]))
     atualizar_proporcoes(novos_valores)
     st.success("Proporções atualizadas!")
-    limpar_cache()
+
+
+def _tab_importacao():
+    """Aba para importação em lote de extratos da B3 e notas de corretagem."""
+
+    st.caption(
+        "Extratos de negociação e de movimentação da B3 (CSV ou XLSX) ou notas "
+        "de corretagem em planilha. Linhas já cadastradas são ignoradas."
+    )
+
+    with st.form("form_importacao", clear_on_submit=True):
+        arquivos = st.file_uploader(
+            "Arquivos", type=["csv", "xlsx"], accept_multiple_files=True
+        )
+        submitted = st.form_submit_button("📥 Importar", width="stretch")
+
+    if not submitted:
+        return
+
+    if not arquivos:
+        st.error("Selecione ao menos um arquivo.")
+        return
+
+    try:
+        resultado = importar(arquivos)
+    except ValueError as erro:
+        st.error(str(erro))
+        return
+
+    lidas_trans, novas_trans = resultado["transacoes_rv"]
+    lidas_prov, novos_prov = resultado["proventos_rv"]
+    st.success(
+        f"**{novas_trans}** de {lidas_trans} transações e **{novos_prov}** de "
+        f"{lidas_prov} proventos importados!"
+    )
 
 
 def pagina_operacoes(
@@ -379,6 +404,7 @@ def pagina_operacoes(
             "Provento RV",
             "Ativo RV",
             "Proporções",
+            "Importar",
         ]
     )
 
@@ -400,6 +426,9 @@ def pagina_operacoes(
     with tabs[5]:
         _tab_proporcoes(proporcoes)
 
+    with tabs[6]:
+        _tab_importacao()
+
 
 dados = carregar_dados()
 pagina_operacoes(
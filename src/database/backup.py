@@ -0,0 +1,128 @@
+"""
+Cópias do banco SQLite feitas com ele em uso (dashboard aberto, atualização de
+cotações rodando).
+
+Uso:
+    python -m src.database.backup [destino]
+    python -m src.database.backup --copia-leitura [destino]
+
+O backup usa a API de backup do SQLite em lotes de páginas, com uma pausa entre
+eles, então o lock de leitura sobre o banco nunca é mantido por muito tempo. Por
+padrão é gravado em dados/backups/ com a data e a hora no nome.
+
+A cópia de leitura é gerada com VACUUM INTO: um arquivo compactado, sem WAL e
+com as estatísticas do otimizador atualizadas, feito para ser aberto como
+imutável (mode=ro&immutable=1). Como o SQLite não verifica alterações num banco
+imutável, a cópia deve ser regerada, e não alterada, quando os dados mudarem.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from src.database.database import CAMINHO_DADOS, CAMINHO_DB
+
+CAMINHO_BACKUPS = CAMINHO_DADOS / "backups"
+CAMINHO_COPIA_LEITURA = CAMINHO_DADOS / "investimentos_leitura.db"
+
+_PAGINAS_POR_LOTE = 256
+_PAUSA_ENTRE_LOTES = 0.005  # segundos
+
+
+def _abrir_origem() -> sqlite3.Connection:
+    return sqlite3.connect(f"{CAMINHO_DB.as_uri()}?mode=ro", uri=True)
+
+
+def _substituir(temporario: Path, destino: Path):
+    """Move o arquivo temporário para o destino de forma atômica, para que um
+    leitor nunca encontre uma cópia pela metade."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temporario, destino)
+
+
+def fazer_backup(
+    destino: Path | None = None,
+    paginas_por_lote: int = _PAGINAS_POR_LOTE,
+    pausa: float = _PAUSA_ENTRE_LOTES,
+) -> Path:
+    """Copia o banco página a página. Entre um lote e outro o lock de leitura é
+    liberado, permitindo que o checkpoint do WAL e os demais leitores prossigam.
+    Se o banco for alterado por outra conexão durante a cópia, o SQLite a
+    reinicia, então o resultado é sempre um estado consistente."""
+
+    if destino is None:
+        destino = CAMINHO_BACKUPS / f"investimentos_{datetime.now():%Y%m%d_%H%M%S}.db"
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(destino.name + ".tmp")
+    temporario.unlink(missing_ok=True)
+
+    lotes = 0
+
+    def progresso(status: int, restantes: int, total: int):
+        nonlocal lotes
+        lotes += 1
+        time.sleep(pausa)
+
+    inicio = time.perf_counter()
+    origem = _abrir_origem()
+    copia = sqlite3.connect(temporario)
+    try:
+        origem.backup(copia, pages=paginas_por_lote, progress=progresso)
+        (paginas,) = copia.execute("PRAGMA page_count").fetchone()
+    finally:
+        copia.close()
+        origem.close()
+    _substituir(temporario, destino)
+
+    tempo = time.perf_counter() - inicio
+    print(f"Backup: {paginas} páginas em {lotes} lotes, {tempo:.2f}s -> {destino}")
+    return destino
+
+
+def exportar_copia_leitura(destino: Path | None = None) -> Path:
+    """Gera uma cópia compactada do banco para leitura (VACUUM INTO). A cópia fica
+    no modo de journal DELETE, sem arquivos -wal/-shm, e com ANALYZE aplicado."""
+
+    destino = destino or CAMINHO_COPIA_LEITURA
+    temporario = destino.with_name(destino.name + ".tmp")
+    temporario.unlink(missing_ok=True)
+
+    inicio = time.perf_counter()
+    origem = _abrir_origem()
+    try:
+        origem.execute("VACUUM INTO ?", (str(temporario),))
+    finally:
+        origem.close()
+
+    copia = sqlite3.connect(temporario)
+    try:
+        copia.execute("PRAGMA journal_mode=DELETE")
+        copia.execute("ANALYZE")
+        copia.commit()
+    finally:
+        copia.close()
+    _substituir(temporario, destino)
+
+    tempo = time.perf_counter() - inicio
+    tamanho = destino.stat().st_size / 2**20
+    print(f"Cópia de leitura: {tamanho:.1f} MiB em {tempo:.2f}s -> {destino}")
+    return destino
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("destino", nargs="?", type=Path, help="arquivo de destino")
+    parser.add_argument(
+        "--copia-leitura",
+        action="store_true",
+        help="gera a cópia compactada para leitura em vez do backup",
+    )
+    argumentos = parser.parse_args()
+
+    if argumentos.copia_leitura:
+        exportar_copia_leitura(argumentos.destino)
+    else:
+        fazer_backup(argumentos.destino)
@@ -0,0 +1,71 @@
+"""
+Cache colunar da tabela cotacoes.
+
+As cotações já processadas (com as variações calculadas) são gravadas num
+arquivo Arrow IPC em dados/, junto com a versão da tabela cotacoes no momento da
+leitura. O arquivo é lido por memory map e só é usado se a versão gravada for a
+mesma do banco; caso contrário, quem chamou deve ler do SQLite.
+
+O pyarrow é opcional: sem ele o cache simplesmente não é usado.
+"""
+
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover
+    pa = None
+
+from src.database.database import CAMINHO_DADOS
+
+CAMINHO_CACHE = CAMINHO_DADOS / "cotacoes.arrow"
+
+_CHAVE_VERSAO = b"versao_cotacoes"
+
+
+def salvar_cache_cotacoes(cotacoes: pd.DataFrame, versao: int | None):
+    """Grava o cache de forma atômica (arquivo temporário + rename), para que um
+    leitor nunca encontre um arquivo pela metade."""
+
+    if pa is None or versao is None:
+        return
+
+    tabela = pa.Table.from_pandas(cotacoes, preserve_index=False)
+    metadados = {**(tabela.schema.metadata or {}), _CHAVE_VERSAO: str(versao).encode()}
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    temporario = CAMINHO_CACHE.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(temporario), "wb") as destino:
+        with ipc.new_file(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+    os.replace(temporario, CAMINHO_CACHE)
+
+
+def ler_cache_cotacoes(versao: int | None) -> pd.DataFrame | None:
+    """Retorna as cotações do cache se ele corresponder à versão informada, ou
+    None se o cache não existir ou estiver desatualizado."""
+
+    if pa is None or versao is None or not CAMINHO_CACHE.exists():
+        return None
+
+    try:
+        leitor = ipc.open_file(pa.memory_map(str(CAMINHO_CACHE)))
+        metadados = leitor.schema.metadata or {}
+        if metadados.get(_CHAVE_VERSAO) != str(versao).encode():
+            return None
+        cotacoes = leitor.read_all().to_pandas()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    cotacoes.attrs["variacoes_calculadas"] = True
+    return cotacoes
+
+
+def remover_cache_cotacoes():
+    """Apaga o cache. Necessário quando o banco é recriado, pois as versões
+    recomeçam e o cache antigo poderia coincidir com a versão do banco novo."""
+
+    CAMINHO_CACHE.unlink(missing_ok=True)
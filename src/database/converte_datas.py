@@ -0,0 +1,27 @@
+"""
+Converte o banco para guardar as datas como inteiros (dias desde 1970-01-01).
+
+Uso:
+    python -m src.database.converte_datas
+
+As tabelas com colunas de data são reconstruídas numa única transação. Depois da
+conversão, as leituras e os filtros por data comparam inteiros, sem converter
+texto com julianday(). Não há conversão de volta para texto, então convém fazer
+um backup antes (python -m src.database.backup).
+"""
+
+import argparse
+import time
+
+from src.database.database import converter_datas_para_inteiro, criar_tabelas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.parse_args()
+
+    criar_tabelas()
+    inicio = time.perf_counter()
+    if converter_datas_para_inteiro():
+        print(f"Datas convertidas em {time.perf_counter() - inicio:.1f}s.")
+    else:
+        print("O banco já guarda as datas como inteiros.")
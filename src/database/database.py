@@ -5,13 +5,26 @@ Centraliza a criação do schema, leitura e escrita de dados
 para substituir o uso da planilha Excel.
 """
 
+import json
+import re
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
+from typing import Callable, Iterable
 from pathlib import Path
 from datetime import date
 
+import numpy as np
 import pandas as pd
 
+from src.database.migracoes import (
+    aplicar_migracoes,
+    reconstruir_tabela,
+    sql_da_tabela,
+    transacao_de_schema,
+)
+
 CAMINHO_DADOS = Path(__file__).resolve().parent.parent.parent / "dados"
 CAMINHO_DB = CAMINHO_DADOS / "investimentos.db"
 
@@ -20,156 +33,400 @@ CAMINHO_DB = CAMINHO_DADOS / "investimentos.db"
 # Conexão
 # ---------------------------------------------------------------------------
 
+# Aplicados uma única vez, quando a conexão da thread é aberta
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",  # 64 MiB
+    "PRAGMA mmap_size=268435456",  # 256 MiB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+# Conexões somente leitura do dashboard. mmap maior porque os leitores percorrem
+# tabelas inteiras; sem foreign_keys e sem WAL, que só importam para escritas.
+_PRAGMAS_LEITURA = (
+    "PRAGMA query_only=ON",
+    "PRAGMA cache_size=-65536",  # 64 MiB
+    "PRAGMA mmap_size=1073741824",  # 1 GiB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class _Conexao(sqlite3.Connection):
+    """Conexão reaproveitada pela thread que a abriu. Guarda o caminho do banco e
+    a profundidade de blocos `conectar()` aninhados."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.caminho = None
+        self.profundidade = 0
+        self.fechada = False
+        self.datas_inteiras = None
+        self.versao_schema = None
+
+    def close(self):
+        self.fechada = True
+        super().close()
+
+
+_local = threading.local()
+
+
+def _obter_conexao() -> _Conexao:
+    """Retorna a conexão da thread atual, abrindo uma nova se necessário. A
+    conexão nunca é compartilhada entre threads e vale enquanto a thread existir:
+    o Streamlit executa cada rerun numa nova thread, que abre a sua conexão, e o
+    armazenamento local da thread (com a conexão) é liberado quando ela termina,
+    o que fecha a conexão."""
+
+    conn = getattr(_local, "conn", None)
+    if conn is not None and not conn.fechada and conn.caminho == CAMINHO_DB:
+        return conn
+    if conn is not None and not conn.fechada:
+        conn.close()
 
-@contextmanager
-def conectar():
-    """Context manager que retorna uma conexão SQLite."""
     conn = sqlite3.connect(
         str(CAMINHO_DB),
         detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+        factory=_Conexao,
+        check_same_thread=False,
     )
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA foreign_keys=ON")
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    conn.caminho = CAMINHO_DB
+
+    _local.conn = conn
+    return conn
+
+
+@contextmanager
+def conectar():
+    """Context manager que retorna a conexão SQLite da thread atual. Blocos
+    aninhados participam da mesma transação, que é confirmada (ou desfeita) ao
+    sair do bloco mais externo."""
+    conn = _obter_conexao()
+    conn.profundidade += 1
     try:
         yield conn
-        conn.commit()
+        if conn.profundidade == 1:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        if conn.profundidade == 1:
+            conn.rollback()
         raise
     finally:
+        conn.profundidade -= 1
+
+
+@contextmanager
+def transacao():
+    """Agrupa várias escritas em uma única transação (e um único commit). O lock
+    de escrita é obtido logo no início (BEGIN IMMEDIATE) para evitar conflitos
+    com outro escritor no meio do bloco."""
+    with conectar() as conn:
+        if conn.profundidade == 1 and not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+
+def fechar_conexoes():
+    """Fecha as conexões (de escrita e de leitura) da thread atual, por exemplo
+    antes de remover ou substituir o arquivo do banco. As conexões de outras
+    threads podem estar em uso e não são tocadas; elas são reabertas sozinhas
+    quando CAMINHO_DB muda e são fechadas quando a thread termina."""
+    for nome in ("conn", "leitura"):
+        conn = _local.__dict__.pop(nome, None)
+        if conn is None or conn.fechada:
+            continue
+        if conn.profundidade:
+            raise RuntimeError("A conexão ainda está em uso num bloco conectar()")
         conn.close()
 
 
+# (caminho, imutável) das leituras do processo, ou None para ler pela conexão de
+# escrita da thread
+_modo_leitura: tuple[Path | None, bool] | None = None
+
+
+def usar_conexoes_de_leitura(caminho: Path | None = None, imutavel: bool = False):
+    """Faz as leituras deste processo usarem conexões somente leitura, separadas
+    da conexão de escrita de cada thread. As escritas continuam usando
+    conectar()/transacao() normalmente.
+
+    As conexões de leitura abrem o banco com mode=ro e query_only, não fazem
+    commit e não participam do checkpoint do WAL, então várias sessões do
+    dashboard leem em paralelo sem disputar com a atualização de cotações ou com
+    o cadastro. caminho e imutavel permitem ler de uma cópia gerada por
+    backup.exportar_copia_leitura."""
+
+    global _modo_leitura
+    _modo_leitura = (caminho, imutavel)
+
+
+def _obter_conexao_leitura() -> _Conexao:
+    caminho, imutavel = _modo_leitura
+    caminho = caminho or CAMINHO_DB
+
+    conn = getattr(_local, "leitura", None)
+    if conn is not None and not conn.fechada and conn.caminho == caminho:
+        return conn
+    if conn is not None and not conn.fechada:
+        conn.close()
+
+    conn = _abrir_somente_leitura(caminho, imutavel)
+    for pragma in _PRAGMAS_LEITURA:
+        conn.execute(pragma)
+    conn.caminho = caminho
+
+    _local.leitura = conn
+    return conn
+
+
 # ---------------------------------------------------------------------------
 # Schema
 # ---------------------------------------------------------------------------
 
-_SCHEMA_SQL = """
-CREATE TABLE IF NOT EXISTS aportes_rf (
-    id              INTEGER PRIMARY KEY AUTOINCREMENT,
-    corretora       TEXT    NOT NULL,
-    emissor         TEXT    NOT NULL,
-    tipo            TEXT    NOT NULL,
-    forma           TEXT    NOT NULL,
-    data_compra     TEXT    NOT NULL,  -- YYYY-MM-DD
-    data_vencimento TEXT    NOT NULL,  -- YYYY-MM-DD
-    indexador       TEXT    NOT NULL,
-    taxa            REAL    NOT NULL,
-    valor           REAL    NOT NULL,
-    reserva         INTEGER NOT NULL DEFAULT 0  -- 0=False, 1=True
-);
-
-CREATE TABLE IF NOT EXISTS resgates_rf (
-    rowid_          INTEGER PRIMARY KEY AUTOINCREMENT,
-    id              INTEGER NOT NULL,
-    data_resgate    TEXT    NOT NULL,  -- YYYY-MM-DD
-    valor           REAL    NOT NULL,
-    final           INTEGER NOT NULL DEFAULT 0,  -- 0=False, 1=True
-    FOREIGN KEY (id) REFERENCES aportes_rf(id)
-);
-
-CREATE TABLE IF NOT EXISTS transacoes_rv (
-    rowid_          INTEGER PRIMARY KEY AUTOINCREMENT,
-    data            TEXT    NOT NULL,  -- YYYY-MM-DD
-    codigo          TEXT    NOT NULL,
-    operacao        TEXT    NOT NULL,
-    quantidade      INTEGER NOT NULL,
-    preco           REAL    NOT NULL,
-    corretora       TEXT    NOT NULL,
-    taxas           REAL    NOT NULL DEFAULT 0
-);
-
-CREATE TABLE IF NOT EXISTS proventos_rv (
-    rowid_          INTEGER PRIMARY KEY AUTOINCREMENT,
-    data_pagamento  TEXT    NOT NULL,  -- YYYY-MM-DD
-    codigo          TEXT    NOT NULL,
-    quantidade      INTEGER NOT NULL,
-    valor           REAL    NOT NULL,
-    tipo            TEXT    NOT NULL DEFAULT 'Rendimento'
-);
-
-CREATE TABLE IF NOT EXISTS ativos_rv (
-    codigo          TEXT PRIMARY KEY,
-    tipo            TEXT NOT NULL,
-    benchmark       TEXT NOT NULL
-);
-
-CREATE TABLE IF NOT EXISTS proporcoes (
-    classe          TEXT PRIMARY KEY,
-    proporcao       REAL NOT NULL
-);
-
-CREATE TABLE IF NOT EXISTS cotacoes (
-    data            TEXT    NOT NULL,  -- YYYY-MM-DD
-    codigo          TEXT    NOT NULL,
-    valor           REAL,
-    variacao        REAL,
-    PRIMARY KEY (data, codigo)
-);
-"""
-
-
 def criar_tabelas():
     """Cria as tabelas caso não existam e aplica migrações pendentes."""
     with conectar() as conn:
-        conn.executescript(_SCHEMA_SQL)
+        aplicar_migracoes(conn)
 
 
 # ---------------------------------------------------------------------------
-# Leitura (retorna DataFrames com nomes de coluna iguais aos da planilha)
+# Formato das datas
+#
+# Por padrão as datas são gravadas como texto YYYY-MM-DD. Opcionalmente, o banco
+# pode ser convertido para guardá-las como inteiros (dias desde 1970-01-01), com
+# python -m src.database.converte_datas, o que evita a conversão de texto nas
+# leituras e nos filtros por data. As leituras funcionam nos dois formatos.
 # ---------------------------------------------------------------------------
 
+_COLUNAS_DATA = {
+    "aportes_rf": ["data_compra", "data_vencimento"],
+    "resgates_rf": ["data_resgate"],
+    "transacoes_rv": ["data"],
+    "proventos_rv": ["data_pagamento"],
+    "cotacoes": ["data"],
+    "cotacoes_indisponiveis": ["data"],
+}
+
+# Dia juliano de 1970-01-01
+_EPOCA_JULIANA = 2440587.5
+
+
+def _datas_inteiras(conn: _Conexao) -> bool:
+    """Indica se o banco guarda as datas como inteiros. O resultado fica salvo
+    na conexão e só é refeito quando o schema muda, por exemplo depois de
+    converter_datas_para_inteiro em outra thread ou processo."""
+
+    (versao_schema,) = conn.execute("PRAGMA schema_version").fetchone()
+    if conn.datas_inteiras is None or conn.versao_schema != versao_schema:
+        tipos = {
+            linha[1]: linha[2] for linha in conn.execute("PRAGMA table_info(cotacoes)")
+        }
+        conn.datas_inteiras = tipos.get("data", "TEXT").upper() == "INTEGER"
+        conn.versao_schema = versao_schema
+    return conn.datas_inteiras
+
+
+def _data_para_sql(data: date | str, conn: _Conexao) -> str | int:
+    dia = np.datetime64(pd.Timestamp(data), "D")
+    if _datas_inteiras(conn):
+        return int(dia.astype("int64"))
+    return str(dia)
+
+
+def _dias_para_sql(datas: list[date], conn: _Conexao) -> list[str] | list[int]:
+    """Versão vetorizada de _data_para_sql."""
+    dias = pd.to_datetime(datas).to_numpy().astype("datetime64[D]")
+    if _datas_inteiras(conn):
+        return dias.astype("int64").tolist()
+    return dias.astype(str).tolist()
+
+
+def _expr_dias(coluna: str) -> str:
+    """Expressão SQL que devolve a coluna de data como dias desde 1970-01-01,
+    seja ela armazenada como texto ou como inteiro."""
+
+    return (
+        f"CASE typeof({coluna}) WHEN 'integer' THEN {coluna} "
+        f"ELSE CAST(julianday({coluna}) - {_EPOCA_JULIANA} AS INTEGER) END"
+    )
+
+
+def _sql_dias(coluna: str, apelido: str | None = None) -> str:
+    return f"{_expr_dias(coluna)} AS {apelido or coluna}"
+
+
+def _converter_dias(serie: pd.Series, datas_nativas: bool) -> pd.Series | np.ndarray:
+    """Converte dias desde 1970-01-01 em datetime64[D] ou, para manter a
+    compatibilidade com o restante do código, em objetos date. Numa coluna de
+    DataFrame, datetime64[D] vira datetime64[s], a menor resolução do pandas."""
+
+    dias = serie.to_numpy(dtype="int64").astype("datetime64[D]")
+    return dias if datas_nativas else dias.astype(object)
+
+
+def converter_datas_para_inteiro() -> bool:
+    """Reconstrói as tabelas com colunas de data para guardá-las como inteiros
+    (dias desde 1970-01-01). Retorna False se o banco já estava convertido."""
 
-def ler_aportes_rf() -> pd.DataFrame:
     with conectar() as conn:
+        if _datas_inteiras(conn):
+            return False
+        with transacao_de_schema(conn):
+            for tabela, colunas in _COLUNAS_DATA.items():
+                _reconstruir_com_datas_inteiras(conn, tabela, colunas)
+    # As demais conexões percebem o novo formato pela versão do schema
+    return True
+
+
+def _reconstruir_com_datas_inteiras(
+    conn: sqlite3.Connection, tabela: str, colunas: list[str]
+):
+    sql = sql_da_tabela(conn, tabela).replace("YYYY-MM-DD", "dias desde 1970-01-01")
+    for coluna in colunas:
+        sql = re.sub(rf"(\b{coluna}\s+)TEXT\b", r"\1INTEGER", sql)
+
+    nomes = [linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")]
+    selecao = [_expr_dias(nome) if nome in colunas else nome for nome in nomes]
+    reconstruir_tabela(conn, tabela, sql, ", ".join(selecao))
+
+
+# ---------------------------------------------------------------------------
+# Versões – contador de escritas por tabela, usado para invalidar caches
+# ---------------------------------------------------------------------------
+
+
+def _registrar_escrita(conn: sqlite3.Connection, tabela: str):
+    """Incrementa a versão da tabela. Deve ser chamada na mesma transação da
+    escrita, para que a versão nunca fique à frente ou atrás dos dados."""
+    conn.execute("UPDATE versoes SET versao = versao + 1 WHERE tabela = ?", (tabela,))
+
+
+def ler_versoes(conexao: sqlite3.Connection | None = None) -> dict[str, int]:
+    """Versão de todas as tabelas com contador."""
+    with _conexao_leitura(conexao) as conn:
+        try:
+            return dict(conn.execute("SELECT tabela, versao FROM versoes"))
+        except sqlite3.OperationalError:
+            return {}
+
+
+def ler_versao(tabela: str, conexao: sqlite3.Connection | None = None) -> int | None:
+    """Versão atual da tabela, ou None se ela não tiver contador (ou se o banco
+    ainda não tiver a tabela versoes)."""
+    with _conexao_leitura(conexao) as conn:
+        try:
+            linha = conn.execute(
+                "SELECT versao FROM versoes WHERE tabela = ?", (tabela,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+    return linha[0] if linha else None
+
+
+# ---------------------------------------------------------------------------
+# Leitura (retorna DataFrames com nomes de coluna iguais aos da planilha)
+#
+# Com datas_nativas=True as colunas de data são datetime64[s]; caso contrário são
+# objetos date, como sempre foram. A consolidação e o dashboard ainda usam objetos
+# date.
+# ---------------------------------------------------------------------------
+
+
+@contextmanager
+def _conexao_leitura(conexao: sqlite3.Connection | None = None):
+    """Usa a conexão informada (por exemplo, a de um snapshot), a conexão de
+    leitura da thread (ver usar_conexoes_de_leitura) ou a conexão da thread."""
+    if conexao is not None:
+        yield conexao
+    elif _modo_leitura is not None:
+        yield _obter_conexao_leitura()
+    else:
+        with conectar() as conn:
+            yield conn
+
+
+@contextmanager
+def _transacao_de_leitura():
+    """Transação de leitura: todas as consultas do bloco enxergam o mesmo estado
+    do banco. Se já houver uma transação aberta na conexão, ela é reaproveitada."""
+    with _conexao_leitura() as conn:
+        iniciada = not conn.in_transaction
+        if iniciada:
+            conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            if iniciada and conn.in_transaction:
+                conn.rollback()
+
+
+def ler_aportes_rf(
+    datas_nativas: bool = False, conexao: sqlite3.Connection | None = None
+) -> pd.DataFrame:
+    with _conexao_leitura(conexao) as conn:
         df = pd.read_sql_query(
             "SELECT id, corretora, emissor, tipo, forma, "
-            "data_compra, data_vencimento AS data_venc, indexador AS 'index', "
-            "taxa, valor, reserva FROM aportes_rf ORDER BY id",
+            f"{_sql_dias('data_compra')}, {_sql_dias('data_vencimento', 'data_venc')}, "
+            "indexador AS 'index', taxa, valor, reserva FROM aportes_rf ORDER BY id",
             conn,
         )
     for col in ["data_compra", "data_venc"]:
-        df[col] = pd.to_datetime(df[col]).dt.date
+        df[col] = _converter_dias(df[col], datas_nativas)
     df["reserva"] = df["reserva"].astype(bool)
     return df
 
 
-def ler_resgates_rf() -> pd.DataFrame:
-    with conectar() as conn:
+def ler_resgates_rf(
+    datas_nativas: bool = False, conexao: sqlite3.Connection | None = None
+) -> pd.DataFrame:
+    with _conexao_leitura(conexao) as conn:
         df = pd.read_sql_query(
-            "SELECT id, data_resgate, valor, final "
-            "FROM resgates_rf ORDER BY data_resgate",
+            f"SELECT id, {_sql_dias('data_resgate')}, valor, final "
+            "FROM resgates_rf ORDER BY resgates_rf.data_resgate",
             conn,
         )
-    df["data_resgate"] = pd.to_datetime(df["data_resgate"]).dt.date
+    df["data_resgate"] = _converter_dias(df["data_resgate"], datas_nativas)
     df["final"] = df["final"].astype(bool)
     return df
 
 
-def ler_transacoes_rv() -> pd.DataFrame:
-    with conectar() as conn:
+def ler_transacoes_rv(
+    datas_nativas: bool = False, conexao: sqlite3.Connection | None = None
+) -> pd.DataFrame:
+    with _conexao_leitura(conexao) as conn:
         df = pd.read_sql_query(
-            "SELECT data, codigo, operacao AS tipo, quantidade AS qtd, "
-            "preco, corretora, taxas FROM transacoes_rv ORDER BY codigo, data",
+            f"SELECT {_sql_dias('data')}, codigo, operacao AS tipo, "
+            "quantidade AS qtd, preco, corretora, taxas "
+            "FROM transacoes_rv ORDER BY codigo, transacoes_rv.data",
             conn,
         )
-    df["data"] = pd.to_datetime(df["data"]).dt.date
+    df["data"] = _converter_dias(df["data"], datas_nativas)
     return df
 
 
-def ler_proventos_rv() -> pd.DataFrame:
-    with conectar() as conn:
+def ler_proventos_rv(
+    datas_nativas: bool = False, conexao: sqlite3.Connection | None = None
+) -> pd.DataFrame:
+    with _conexao_leitura(conexao) as conn:
         df = pd.read_sql_query(
-            "SELECT data_pagamento AS dt_pag, codigo, quantidade AS qtd, "
-            "valor, tipo FROM proventos_rv ORDER BY data_pagamento DESC, codigo DESC",
+            f"SELECT {_sql_dias('data_pagamento', 'dt_pag')}, codigo, "
+            "quantidade AS qtd, valor, tipo FROM proventos_rv "
+            "ORDER BY data_pagamento DESC, codigo DESC",
             conn,
         )
-    df["dt_pag"] = pd.to_datetime(df["dt_pag"]).dt.date
+    df["dt_pag"] = _converter_dias(df["dt_pag"], datas_nativas)
     return df
 
 
-def ler_ativos_rv() -> pd.DataFrame:
-    with conectar() as conn:
+def ler_ativos_rv(conexao: sqlite3.Connection | None = None) -> pd.DataFrame:
+    with _conexao_leitura(conexao) as conn:
         df = pd.read_sql_query(
             "SELECT codigo, tipo AS tipo_ativo, benchmark AS bench "
             "FROM ativos_rv ORDER BY codigo",
@@ -178,48 +435,334 @@ def ler_ativos_rv() -> pd.DataFrame:
     return df
 
 
-def ler_proporcoes() -> pd.DataFrame:
-    with conectar() as conn:
+def ler_proporcoes(conexao: sqlite3.Connection | None = None) -> pd.DataFrame:
+    with _conexao_leitura(conexao) as conn:
         df = pd.read_sql_query("SELECT classe, proporcao FROM proporcoes", conn)
     return df
 
 
-def ler_cotacoes() -> pd.DataFrame:
-    """Retorna o histórico completo de cotações / indicadores."""
-    with conectar() as conn:
+def ler_cotacoes(
+    datas_nativas: bool = False,
+    conexao: sqlite3.Connection | None = None,
+    codigos: Iterable[str] | None = None,
+    data_inicio: date | dict[str, date] | None = None,
+    data_fim: date | None = None,
+    incluir_anterior: bool = False,
+) -> pd.DataFrame:
+    """Retorna o histórico de cotações / indicadores. Sem filtros, retorna o
+    histórico completo.
+
+    Os filtros são aplicados na própria consulta. data_inicio pode ser uma data
+    única ou um dicionário com a data inicial de cada código (nesse caso, apenas
+    esses códigos são lidos). Com incluir_anterior=True também é retornada a última
+    cotação anterior à data inicial, necessária para calcular a variação do
+    primeiro dia."""
+
+    if isinstance(data_inicio, dict):
+        codigos = list(data_inicio) if codigos is None else list(codigos)
+        inicios = {codigo: data_inicio[codigo] for codigo in codigos}
+    elif codigos is not None and data_inicio is not None:
+        inicios = {codigo: data_inicio for codigo in codigos}
+    else:
+        inicios = None
+
+    with _conexao_leitura(conexao) as conn:
+        condicoes, params = [], []
+        if inicios is not None:
+            # Um intervalo por código, para que cada um seja uma busca pela chave
+            partes = []
+            for codigo, inicio in inicios.items():
+                inicio = _data_para_sql(inicio, conn)
+                if incluir_anterior:
+                    partes.append(
+                        "(codigo = ? AND cotacoes.data >= COALESCE("
+                        "(SELECT MAX(anterior.data) FROM cotacoes AS anterior "
+                        "WHERE anterior.codigo = ? AND anterior.data < ?), ?))"
+                    )
+                    params.extend([codigo, codigo, inicio, inicio])
+                else:
+                    partes.append("(codigo = ? AND cotacoes.data >= ?)")
+                    params.extend([codigo, inicio])
+            condicoes.append(f"({' OR '.join(partes) or '0'})")
+        else:
+            if codigos is not None:
+                codigos = list(codigos)
+                condicoes.append(f"codigo IN ({', '.join('?' * len(codigos))})")
+                params.extend(codigos)
+            if data_inicio is not None:
+                inicio = _data_para_sql(data_inicio, conn)
+                if incluir_anterior:
+                    condicoes.append(
+                        "cotacoes.data >= COALESCE("
+                        "(SELECT MAX(anterior.data) FROM cotacoes AS anterior "
+                        "WHERE anterior.codigo = cotacoes.codigo "
+                        "AND anterior.data < ?), ?)"
+                    )
+                    params.extend([inicio, inicio])
+                else:
+                    condicoes.append("cotacoes.data >= ?")
+                    params.append(inicio)
+        if data_fim is not None:
+            condicoes.append("cotacoes.data <= ?")
+            params.append(_data_para_sql(data_fim, conn))
+
+        where = f"WHERE {' AND '.join(condicoes)} " if condicoes else ""
         df = pd.read_sql_query(
-            "SELECT data, codigo, valor, variacao FROM cotacoes "
-            "ORDER BY codigo, data",
+            f"SELECT {_sql_dias('data')}, codigo, valor, variacao FROM cotacoes "
+            f"{where}ORDER BY codigo, cotacoes.data",
             conn,
+            params=params,
         )
-    df["data"] = pd.to_datetime(df["data"]).dt.date
+    df["data"] = _converter_dias(df["data"], datas_nativas)
     return df
 
 
+def ler_cotacoes_com_versao() -> tuple[pd.DataFrame, int | None]:
+    """Todas as cotações e a versão da tabela, lidas na mesma transação."""
+    with _transacao_de_leitura() as conn:
+        return ler_cotacoes(conexao=conn), ler_versao("cotacoes", conn)
+
+
 def ler_datas_cotacoes(codigo: str, data_inicio: date | None = None) -> list[date]:
     """Lê cotações de um indicador, opcionalmente a partir de uma data."""
 
-    with conectar() as conn:
+    with _conexao_leitura() as conn:
         if data_inicio:
             df = pd.read_sql_query(
-                "SELECT DISTINCT data FROM cotacoes "
-                "WHERE codigo = ? AND data >= ? ORDER BY data",
+                f"SELECT DISTINCT {_sql_dias('data')} FROM cotacoes "
+                "WHERE codigo = ? AND cotacoes.data >= ? ORDER BY cotacoes.data",
                 conn,
-                params=(codigo, str(data_inicio)),
+                params=(codigo, _data_para_sql(data_inicio, conn)),
             )
         else:
             df = pd.read_sql_query(
-                "SELECT DISTINCT data FROM cotacoes " "WHERE codigo = ? ORDER BY data",
+                f"SELECT DISTINCT {_sql_dias('data')} FROM cotacoes "
+                "WHERE codigo = ? ORDER BY cotacoes.data",
                 conn,
                 params=(codigo,),
             )
 
     if not df.empty:
-        return pd.to_datetime(df["data"]).dt.date.tolist()
+        return _converter_dias(df["data"], datas_nativas=False).tolist()
 
     return []
 
 
+def ler_primeira_data_cotacoes() -> date | None:
+    """Data da cotação mais antiga do banco, de qualquer indicador."""
+
+    with _conexao_leitura() as conn:
+        (dia,) = conn.execute(
+            f"SELECT {_expr_dias('MIN(data)')} FROM cotacoes"
+        ).fetchone()
+    if dia is None:
+        return None
+    return _converter_dias(pd.Series([dia]), datas_nativas=False)[0]
+
+
+def ler_datas_faltantes(
+    grupos: list[tuple[list[str], list[date]]],
+    apos_primeira_cotacao: bool = False,
+    incluir_indisponiveis: bool = False,
+) -> dict[str, list[date]]:
+    """Datas sem cotação de cada indicador, numa única consulta. Cada grupo é um
+    par (códigos, dias esperados), como os ativos da bolsa e os dias de pregão.
+
+    A consulta é um anti-join dos pares (código, dia) contra a chave primária de
+    cotacoes, então o custo cresce com o número de pares, e não com o tamanho da
+    tabela. Com apos_primeira_cotacao, os dias anteriores à primeira cotação de
+    cada indicador são ignorados, o que permite varrer todo o histórico sem
+    apontar como faltantes os dias em que o indicador ainda não existia. Um
+    indicador sem nenhuma cotação é varrido desde a primeira cotação do banco.
+
+    As datas marcadas como indisponíveis (ver registrar_indisponiveis) ficam de
+    fora até o seu tentar_apos, a menos que incluir_indisponiveis seja True."""
+
+    grupos = [(codigos, dias) for codigos, dias in grupos if codigos and dias]
+    if not grupos:
+        return {}
+
+    with _conexao_leitura() as conn:
+        pares = " UNION ALL ".join(
+            "SELECT c.value AS codigo, d.value AS data "
+            "FROM json_each(?) AS c, json_each(?) AS d"
+            for _ in grupos
+        )
+        params = []
+        for codigos, dias in grupos:
+            params.append(json.dumps(codigos))
+            params.append(json.dumps(_dias_para_sql(dias, conn)))
+
+        # Um indicador ainda sem cotações começa na primeira cotação do banco
+        filtro_inicio = (
+            "AND esperados.data >= COALESCE("
+            "(SELECT MIN(data) FROM cotacoes WHERE codigo = esperados.codigo), "
+            "(SELECT MIN(data) FROM cotacoes)) "
+            if apos_primeira_cotacao
+            else ""
+        )
+        filtro_indisponiveis = ""
+        if not incluir_indisponiveis:
+            filtro_indisponiveis = (
+                "AND NOT EXISTS (SELECT 1 FROM cotacoes_indisponiveis AS i "
+                "WHERE i.codigo = esperados.codigo AND i.data = esperados.data "
+                "AND i.tentar_apos > ?) "
+            )
+            params.append(int(time.time()))
+        df = pd.read_sql_query(
+            f"WITH esperados AS ({pares}) "
+            f"SELECT esperados.codigo, {_sql_dias('esperados.data', 'data')} "
+            "FROM esperados "
+            "WHERE NOT EXISTS (SELECT 1 FROM cotacoes "
+            "WHERE cotacoes.codigo = esperados.codigo "
+            "AND cotacoes.data = esperados.data) "
+            f"{filtro_inicio}"
+            f"{filtro_indisponiveis}"
+            "ORDER BY esperados.codigo, esperados.data",
+            conn,
+            params=params,
+        )
+
+    datas = _converter_dias(df["data"], datas_nativas=False)
+    return {
+        codigo: datas[indices].tolist()
+        for codigo, indices in df.groupby("codigo").indices.items()
+    }
+
+
+def registrar_indisponiveis(
+    datas_por_codigo: dict[str, list[date]],
+    espera_inicial: float,
+    espera_maxima: float,
+) -> int:
+    """Marca datas que a fonte não tem. Na primeira vez, a data volta a ser pedida
+    depois de espera_inicial segundos; a cada nova tentativa sem sucesso, a
+    espera é multiplicada por 4, até espera_maxima. Marcações de datas que já
+    têm cotação são removidas. Retorna a quantidade de datas marcadas."""
+
+    agora = int(time.time())
+    with transacao() as conn:
+        linhas = [
+            (codigo, dia, agora + int(espera_inicial))
+            for codigo, datas in datas_por_codigo.items()
+            if datas
+            for dia in _dias_para_sql(datas, conn)
+        ]
+        conn.executemany(
+            "INSERT INTO cotacoes_indisponiveis "
+            "(codigo, data, tentativas, tentar_apos) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT (codigo, data) DO UPDATE SET "
+            "tentativas = tentativas + 1, "
+            # 4^tentativas, limitado para não estourar o inteiro de 64 bits
+            "tentar_apos = ? + MIN(? * (1 << MIN(2 * tentativas, 40)), ?)",
+            [
+                (*linha, agora, int(espera_inicial), int(espera_maxima))
+                for linha in linhas
+            ],
+        )
+        conn.execute(
+            "DELETE FROM cotacoes_indisponiveis WHERE EXISTS (SELECT 1 FROM cotacoes "
+            "WHERE cotacoes.codigo = cotacoes_indisponiveis.codigo "
+            "AND cotacoes.data = cotacoes_indisponiveis.data)"
+        )
+    return len(linhas)
+
+
+# ---------------------------------------------------------------------------
+# Snapshot – todas as tabelas lidas numa única transação de leitura
+# ---------------------------------------------------------------------------
+
+_LEITORES_SNAPSHOT = {
+    "aportes_rf": ler_aportes_rf,
+    "resgates_rf": ler_resgates_rf,
+    "transacoes_rv": ler_transacoes_rv,
+    "proventos_rv": ler_proventos_rv,
+    "ativos_rv": ler_ativos_rv,
+    "proporcoes": ler_proporcoes,
+    "cotacoes": ler_cotacoes,
+}
+
+
+def _abrir_somente_leitura(
+    caminho: Path | None = None, imutavel: bool = False
+) -> sqlite3.Connection:
+    """Conexão somente leitura que pode ser usada por várias threads. Com
+    imutavel=True o SQLite não usa locks nem verifica se o arquivo mudou, o que só
+    é seguro para cópias que nunca são alteradas (ver backup.py)."""
+    parametros = "mode=ro&immutable=1" if imutavel else "mode=ro"
+    return sqlite3.connect(
+        f"{(caminho or CAMINHO_DB).as_uri()}?{parametros}",
+        uri=True,
+        factory=_Conexao,
+        check_same_thread=False,
+    )
+
+
+def carregar_snapshot(
+    janelas_cotacoes: Callable[[dict[str, pd.DataFrame]], dict[str, date]]
+    | None = None,
+    cotacoes_em_cache: Callable[[int | None], pd.DataFrame | None] | None = None,
+) -> tuple[dict[str, pd.DataFrame], dict[str, int], dict[str, float]]:
+    """Lê todas as tabelas dentro de uma mesma transação de leitura, garantindo
+    uma visão consistente mesmo que haja escritas concorrentes (no modo WAL os
+    leitores não são bloqueados e enxergam o banco como no início da transação).
+
+    Se janelas_cotacoes for informada, ela recebe as demais tabelas e retorna a
+    data inicial de cada código necessário; apenas essas cotações são lidas
+    (junto com a cotação anterior a cada janela).
+
+    Se cotacoes_em_cache for informada, ela recebe a versão da tabela cotacoes
+    (lida na mesma transação) e pode retornar as cotações de um cache; nesse caso
+    a tabela não é lida. Se retornar None, a leitura segue normalmente.
+    Retorna os DataFrames, as versões das tabelas (ver ler_versoes) lidas na
+    mesma transação e o tempo de carga de cada tabela, em segundos."""
+
+    tempos = {}
+
+    def ler(tabela: str, conn: sqlite3.Connection, **filtros) -> pd.DataFrame:
+        inicio = time.perf_counter()
+        df = _LEITORES_SNAPSHOT[tabela](conexao=conn, **filtros)
+        tempos[tabela] = time.perf_counter() - inicio
+        return df
+
+    def ler_cache(versao: int | None) -> pd.DataFrame | None:
+        if cotacoes_em_cache is None:
+            return None
+        inicio = time.perf_counter()
+        df = cotacoes_em_cache(versao)
+        if df is not None:
+            tempos["cotacoes"] = time.perf_counter() - inicio
+        return df
+
+    # Ler as tabelas em threads não traz ganho: o tempo vai quase todo na
+    # montagem dos DataFrames, que não libera o GIL
+    with _transacao_de_leitura() as conn:
+        # As versões são lidas antes das tabelas, já dentro da transação
+        versoes = ler_versoes(conn)
+        em_cache = ler_cache(versoes.get("cotacoes"))
+
+        # Com janelas, as cotações dependem das outras tabelas e são lidas por
+        # último
+        primeiras = [
+            tabela
+            for tabela in _LEITORES_SNAPSHOT
+            if tabela != "cotacoes" or (janelas_cotacoes is None and em_cache is None)
+        ]
+        tabelas = {t: ler(t, conn) for t in primeiras}
+
+        if em_cache is not None:
+            tabelas["cotacoes"] = em_cache
+        elif janelas_cotacoes is not None:
+            tabelas["cotacoes"] = ler(
+                "cotacoes",
+                conn,
+                data_inicio=janelas_cotacoes(tabelas),
+                incluir_anterior=True,
+            )
+
+    return tabelas, versoes, tempos
+
+
 # ---------------------------------------------------------------------------
 # Escrita – inserções unitárias (para o formulário do dashboard)
 # ---------------------------------------------------------------------------
@@ -249,14 +792,15 @@ def inserir_aporte_rf(
                 emissor,
                 tipo,
                 forma,
-                str(data_compra),
-                str(data_vencimento),
+                _data_para_sql(data_compra, conn),
+                _data_para_sql(data_vencimento, conn),
                 indexador,
                 taxa,
                 valor,
                 int(reserva),
             ),
         )
+        _registrar_escrita(conn, "aportes_rf")
         return cursor.lastrowid
 
 
@@ -270,8 +814,9 @@ def inserir_resgate_rf(
         conn.execute(
             "INSERT INTO resgates_rf (id, data_resgate, valor, final) "
             "VALUES (?, ?, ?, ?)",
-            (id_aporte, str(data_resgate), valor, int(final)),
+            (id_aporte, _data_para_sql(data_resgate, conn), valor, int(final)),
         )
+        _registrar_escrita(conn, "resgates_rf")
 
 
 def inserir_transacao_rv(
@@ -288,8 +833,17 @@ def inserir_transacao_rv(
             "INSERT INTO transacoes_rv "
             "(data, codigo, operacao, quantidade, preco, corretora, taxas) "
             "VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (str(data), codigo, operacao, quantidade, preco, corretora, taxas),
+            (
+                _data_para_sql(data, conn),
+                codigo,
+                operacao,
+                quantidade,
+                preco,
+                corretora,
+                taxas,
+            ),
         )
+        _registrar_escrita(conn, "transacoes_rv")
 
 
 def inserir_provento_rv(
@@ -304,8 +858,15 @@ def inserir_provento_rv(
             "INSERT INTO proventos_rv "
             "(data_pagamento, codigo, quantidade, valor, tipo) "
             "VALUES (?, ?, ?, ?, ?)",
-            (str(data_pagamento), codigo, quantidade, valor, tipo),
+            (
+                _data_para_sql(data_pagamento, conn),
+                codigo,
+                quantidade,
+                valor,
+                tipo,
+            ),
         )
+        _registrar_escrita(conn, "proventos_rv")
 
 
 def inserir_ativo_rv(
@@ -319,6 +880,7 @@ def inserir_ativo_rv(
             "VALUES (?, ?, ?)",
             (codigo, tipo, benchmark),
         )
+        _registrar_escrita(conn, "ativos_rv")
 
 
 def atualizar_proporcoes(proporcoes: dict[str, float]):
@@ -330,6 +892,7 @@ def atualizar_proporcoes(proporcoes: dict[str, float]):
                 "UPDATE proporcoes SET proporcao = ? WHERE classe = ?",
                 (proporcao, classe),
             )
+        _registrar_escrita(conn, "proporcoes")
 
 
 def inserir_cotacao(
@@ -343,5 +906,255 @@ def inserir_cotacao(
         conn.execute(
             "INSERT OR REPLACE INTO cotacoes (data, codigo, valor, variacao) "
             "VALUES (?, ?, ?, ?)",
-            (str(data), codigo, valor, variacao),
+            (_data_para_sql(data, conn), codigo, valor, variacao),
+        )
+        _registrar_escrita(conn, "cotacoes")
+
+
+def remover_cotacoes_desde(data_inicio: date) -> int:
+    """Remove as cotações (e as marcações de datas indisponíveis) a partir da
+    data. Retorna a quantidade de cotações removidas."""
+    with transacao() as conn:
+        dia = _data_para_sql(data_inicio, conn)
+        cursor = conn.execute("DELETE FROM cotacoes WHERE data >= ?", (dia,))
+        removidas = cursor.rowcount
+        conn.execute("DELETE FROM cotacoes_indisponiveis WHERE data >= ?", (dia,))
+        _registrar_escrita(conn, "cotacoes")
+    return removidas
+
+
+# ---------------------------------------------------------------------------
+# Escrita – inserções em lote (atualização de cotações, migração e importação)
+# ---------------------------------------------------------------------------
+
+_COLUNAS_COTACOES = ["data", "codigo", "valor", "variacao"]
+_COLUNAS_TRANSACOES_RV = [
+    "data",
+    "codigo",
+    "operacao",
+    "quantidade",
+    "preco",
+    "corretora",
+    "taxas",
+]
+_COLUNAS_PROVENTOS_RV = ["data_pagamento", "codigo", "quantidade", "valor", "tipo"]
+
+
+def _preparar_linhas(
+    dados: pd.DataFrame | Iterable[tuple],
+    colunas: list[str],
+    colunas_data: list[str],
+    datas_inteiras: bool,
+) -> list[tuple]:
+    """Converte um DataFrame (com as colunas da tabela) ou um iterável de tuplas
+    (na ordem das colunas) em tuplas prontas para o executemany. As datas são
+    convertidas para o formato do banco e valores nulos viram None."""
+
+    if isinstance(dados, pd.DataFrame):
+        df = dados.loc[:, colunas]
+    else:
+        df = pd.DataFrame(list(dados), columns=colunas)
+    return _para_tuplas(_formatar_datas(df, colunas_data, datas_inteiras))
+
+
+def _formatar_datas(
+    df: pd.DataFrame, colunas_data: list[str], datas_inteiras: bool
+) -> pd.DataFrame:
+    """Converte as colunas de data para o formato do banco (texto ou inteiro)."""
+
+    df = df.copy()
+    for col in colunas_data:
+        dias = pd.to_datetime(df[col]).to_numpy().astype("datetime64[D]")
+        df[col] = dias.astype("int64") if datas_inteiras else dias.astype(str)
+    return df
+
+
+def _para_tuplas(df: pd.DataFrame) -> list[tuple]:
+    df = df.astype(object)
+    df = df.where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+def _inserir_em_lote(
+    tabela: str,
+    sql: str,
+    dados: pd.DataFrame | Iterable[tuple],
+    colunas: list[str],
+    colunas_data: list[str],
+) -> int:
+    with transacao() as conn:
+        datas_inteiras = _datas_inteiras(conn)
+        linhas = _preparar_linhas(dados, colunas, colunas_data, datas_inteiras)
+        if linhas:
+            conn.executemany(sql, linhas)
+            _registrar_escrita(conn, tabela)
+    return len(linhas)
+
+
+def inserir_cotacoes(dados: pd.DataFrame | Iterable[tuple]) -> int:
+    """Insere ou atualiza várias linhas da tabela cotacoes numa única transação.
+    Retorna a quantidade de linhas gravadas."""
+    return _inserir_em_lote(
+        "cotacoes",
+        "INSERT OR REPLACE INTO cotacoes (data, codigo, valor, variacao) "
+        "VALUES (?, ?, ?, ?)",
+        dados,
+        _COLUNAS_COTACOES,
+        ["data"],
+    )
+
+
+def inserir_transacoes_rv(dados: pd.DataFrame | Iterable[tuple]) -> int:
+    """Insere várias transações RV numa única transação. Como a tabela não tem
+    chave natural, as linhas são sempre acrescentadas."""
+    return _inserir_em_lote(
+        "transacoes_rv",
+        "INSERT INTO transacoes_rv "
+        "(data, codigo, operacao, quantidade, preco, corretora, taxas) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        dados,
+        _COLUNAS_TRANSACOES_RV,
+        ["data"],
+    )
+
+
+def inserir_proventos_rv(dados: pd.DataFrame | Iterable[tuple]) -> int:
+    """Insere vários proventos RV numa única transação."""
+    return _inserir_em_lote(
+        "proventos_rv",
+        "INSERT INTO proventos_rv "
+        "(data_pagamento, codigo, quantidade, valor, tipo) "
+        "VALUES (?, ?, ?, ?, ?)",
+        dados,
+        _COLUNAS_PROVENTOS_RV,
+        ["data_pagamento"],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Carga em massa – migração da planilha
+# ---------------------------------------------------------------------------
+
+# Tabelas com chave natural: na carga incremental, linhas com uma chave já
+# existente são ignoradas. Nas demais, a comparação é feita por todas as colunas.
+_CHAVES_NATURAIS = {
+    "aportes_rf": ["id"],
+    "ativos_rv": ["codigo"],
+    "proporcoes": ["classe"],
+    "cotacoes": ["codigo", "data"],
+}
+
+_TAMANHO_LOTE = 50_000
+
+
+def _hash_linhas(df: pd.DataFrame) -> pd.Series:
+    """Hash de 64 bits de cada linha. Os números reais são arredondados para que
+    um preço digitado e o mesmo preço lido de um arquivo tenham o mesmo hash."""
+
+    df = df.copy()
+    for col in df.columns[[dtype.kind == "f" for dtype in df.dtypes]]:
+        df[col] = df[col].round(6)
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+def _linhas_ausentes(
+    conn: sqlite3.Connection,
+    tabela: str,
+    novas: pd.DataFrame,
+    colunas_chave: list[str] | None = None,
+) -> pd.DataFrame:
+    """Linhas de novas (já no formato do banco) que não estão na tabela. Duas
+    linhas são iguais se tiverem o mesmo hash das colunas_chave (padrão: todas).
+    Linhas repetidas contam como multiconjunto: se a planilha tem duas transações
+    idênticas e o banco apenas uma, só a segunda é acrescentada."""
+
+    if novas.empty:
+        return novas
+
+    colunas_chave = colunas_chave or list(novas.columns)
+    sql = f"SELECT {', '.join(colunas_chave)} FROM {tabela}"
+    parametros = []
+
+    # Só é preciso comparar com as linhas do mesmo período
+    datas = [c for c in _COLUNAS_DATA.get(tabela, []) if c in colunas_chave]
+    if datas:
+        sql += f" WHERE {datas[0]} BETWEEN ? AND ?"
+        # tolist() devolve escalares do Python: um numpy.int64 seria gravado
+        # pelo sqlite3 como BLOB e não seria igual a nenhuma data
+        parametros = novas[datas[0]].agg(["min", "max"]).tolist()
+    existentes = pd.read_sql_query(sql, conn, params=parametros)
+
+    # Numera as ocorrências de cada hash para que a comparação conte repetições
+    hash_novas = _hash_linhas(novas[colunas_chave].astype(existentes.dtypes))
+    hash_existentes = _hash_linhas(existentes)
+    chaves_novas = pd.DataFrame(
+        {"hash": hash_novas, "ocorrencia": hash_novas.groupby(hash_novas).cumcount()}
+    )
+    chaves_existentes = pd.DataFrame(
+        {
+            "hash": hash_existentes,
+            "ocorrencia": hash_existentes.groupby(hash_existentes).cumcount(),
+        }
+    )
+
+    marcadas = chaves_novas.merge(chaves_existentes, how="left", indicator=True)
+    return novas.loc[marcadas["_merge"].eq("left_only").to_numpy()]
+
+
+def _indices_da_tabela(conn: sqlite3.Connection, tabela: str) -> dict[str, str]:
+    return dict(
+        conn.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (tabela,),
         )
+    )
+
+
+def carregar_tabela(
+    tabela: str,
+    dados: pd.DataFrame,
+    apenas_novas: bool = False,
+    colunas_chave: list[str] | None = None,
+) -> int:
+    """Carrega um DataFrame com as colunas da tabela numa única transação, com
+    executemany em lotes. Se a tabela estiver vazia, os índices secundários são
+    removidos antes da carga e recriados depois, o que é mais rápido do que
+    atualizá-los linha a linha.
+
+    Com apenas_novas=True apenas as linhas que ainda não existem no banco são
+    acrescentadas; nada é apagado. Nas tabelas sem chave natural, colunas_chave
+    define quais colunas identificam uma linha (padrão: todas as informadas).
+    Retorna a quantidade de linhas inseridas."""
+
+    colunas = list(dados.columns)
+    chave = _CHAVES_NATURAIS.get(tabela)
+    conflito = "OR IGNORE " if apenas_novas and chave else ""
+    sql = (
+        f"INSERT {conflito}INTO {tabela} ({', '.join(colunas)}) "
+        f"VALUES ({', '.join('?' * len(colunas))})"
+    )
+
+    with transacao() as conn:
+        colunas_data = _COLUNAS_DATA.get(tabela, [])
+        df = _formatar_datas(dados, colunas_data, _datas_inteiras(conn))
+        if apenas_novas and not chave:
+            df = _linhas_ausentes(conn, tabela, df, colunas_chave)
+
+        vazia = conn.execute(f"SELECT 1 FROM {tabela} LIMIT 1").fetchone() is None
+        indices = _indices_da_tabela(conn, tabela) if vazia else {}
+        for nome in indices:
+            conn.execute(f"DROP INDEX {nome}")
+
+        alteracoes = conn.total_changes
+        for inicio in range(0, len(df), _TAMANHO_LOTE):
+            lote = df.iloc[inicio:inicio + _TAMANHO_LOTE]
+            conn.executemany(sql, _para_tuplas(lote))
+        inseridas = conn.total_changes - alteracoes
+
+        for sql_indice in indices.values():
+            conn.execute(sql_indice)
+        if inseridas:
+            _registrar_escrita(conn, tabela)
+
+    return inseridas
@@ -2,33 +2,140 @@
 Script de migração: converte os dados da planilha Excel para o banco SQLite.
 
 Uso:
-    python src/migra_excel_sqlite.py
+    python -m src.database.migra_excel_sqlite [--incremental]
 
 O banco será criado em dados/investimentos.db.
 A planilha Excel original não é removida.
+
+Por padrão o banco é recriado do zero. Com --incremental o banco existente é
+mantido e apenas as linhas da planilha (e do parquet de cotações) que ainda não
+estão nele são acrescentadas.
 """
 
+import argparse
+import time
+
 import pandas as pd
 
+from src.database.cache_cotacoes import remover_cache_cotacoes
 from src.database.database import (
     CAMINHO_DB,
     CAMINHO_DADOS,
+    carregar_tabela,
     criar_tabelas,
-    conectar,
+    fechar_conexoes,
 )
 
 CAMINHO_EXCEL = CAMINHO_DADOS / "Investimentos.xlsx"
 CAMINHO_COTACOES = CAMINHO_DADOS / "cotacoes.parquet"
 
-
-def migrar():
+# Aba da planilha -> (tabela, {coluna da planilha: (coluna da tabela, tipo)})
+_PLANILHAS = {
+    "Aportes RF": (
+        "aportes_rf",
+        {
+            "ID": ("id", int),
+            "Corretora": ("corretora", str),
+            "Emissor": ("emissor", str),
+            "Tipo": ("tipo", str),
+            "Forma": ("forma", str),
+            "Data compra": ("data_compra", "data"),
+            "Data vencimento": ("data_vencimento", "data"),
+            "Indexador": ("indexador", str),
+            "Taxa": ("taxa", float),
+            "Valor": ("valor", float),
+            "Reserva": ("reserva", bool),
+        },
+    ),
+    "Resgates RF": (
+        "resgates_rf",
+        {
+            "ID": ("id", int),
+            "Data resgate": ("data_resgate", "data"),
+            "Valor": ("valor", float),
+            "Final": ("final", bool),
+        },
+    ),
+    "Transações RV": (
+        "transacoes_rv",
+        {
+            "Data": ("data", "data"),
+            "Código": ("codigo", str),
+            "Operação C/V": ("operacao", str),
+            "Quantidade": ("quantidade", int),
+            "Preço": ("preco", float),
+            "Corretora": ("corretora", str),
+            "Taxas": ("taxas", float),
+        },
+    ),
+    "Proventos RV": (
+        "proventos_rv",
+        {
+            "Data pagamento": ("data_pagamento", "data"),
+            "Código": ("codigo", str),
+            "Quantidade": ("quantidade", int),
+            "Valor": ("valor", float),
+            "Tipo": ("tipo", str),
+        },
+    ),
+    "Ativos RV": (
+        "ativos_rv",
+        {
+            "Código": ("codigo", str),
+            "Tipo": ("tipo", str),
+            "Benchmark": ("benchmark", str),
+        },
+    ),
+    "Proporções": (
+        "proporcoes",
+        {
+            "Classe": ("classe", str),
+            "Proporção": ("proporcao", float),
+        },
+    ),
+}
+
+_COLUNAS_COTACOES = ["data", "codigo", "valor", "variacao"]
+
+
+def _converter_planilha(df: pd.DataFrame, colunas: dict) -> pd.DataFrame:
+    """Renomeia e converte as colunas da aba de uma só vez. Booleanos são gravados
+    como 0/1 e as datas são formatadas na carga."""
+
+    convertido = {}
+    for coluna_planilha, (coluna, tipo) in colunas.items():
+        serie = df[coluna_planilha]
+        if tipo == "data":
+            convertido[coluna] = pd.to_datetime(serie)
+        elif tipo is bool:
+            convertido[coluna] = serie.astype(bool).astype(int)
+        else:
+            convertido[coluna] = serie.astype(tipo)
+    return pd.DataFrame(convertido)
+
+
+def _carregar(nome: str, tabela: str, df: pd.DataFrame, incremental: bool):
+    inicio = time.perf_counter()
+    inseridas = carregar_tabela(tabela, df, apenas_novas=incremental)
+    tempo = time.perf_counter() - inicio
+
+    taxa = len(df) / tempo if tempo > 0 else float("inf")
+    print(
+        f"  {nome}: {inseridas} de {len(df)} registros migrados em {tempo:.2f}s "
+        f"({taxa:,.0f} linhas/s)."
+    )
+
+
+def migrar(incremental: bool = False):
     if not CAMINHO_EXCEL.exists():
         print(f"Planilha não encontrada: {CAMINHO_EXCEL}")
         return
 
     # Remove banco antigo, se existir, para migrar do zero
-    if CAMINHO_DB.exists():
+    if not incremental and CAMINHO_DB.exists():
+        fechar_conexoes()
         CAMINHO_DB.unlink()
+        remover_cache_cotacoes()
         print("Banco antigo removido.")
 
     criar_tabelas()
@@ -36,128 +143,15 @@ def migrar():
 
     excel = pd.read_excel(CAMINHO_EXCEL, sheet_name=None, engine="openpyxl")
 
-    # --- Aportes RF ---
-    df = excel["Aportes RF"]
-    with conectar() as conn:
-        for _, row in df.iterrows():
-            conn.execute(
-                "INSERT INTO aportes_rf "
-                "(id, corretora, emissor, tipo, forma, data_compra, "
-                "data_vencimento, indexador, taxa, valor, reserva) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    int(row["ID"]),
-                    str(row["Corretora"]),
-                    str(row["Emissor"]),
-                    str(row["Tipo"]),
-                    str(row["Forma"]),
-                    str(pd.Timestamp(row["Data compra"]).date()),
-                    str(pd.Timestamp(row["Data vencimento"]).date()),
-                    str(row["Indexador"]),
-                    float(row["Taxa"]),
-                    float(row["Valor"]),
-                    int(bool(row["Reserva"])),
-                ),
-            )
-    print(f"  Aportes RF: {len(df)} registros migrados.")
-
-    # --- Resgates RF ---
-    df = excel["Resgates RF"]
-    with conectar() as conn:
-        for _, row in df.iterrows():
-            conn.execute(
-                "INSERT INTO resgates_rf (id, data_resgate, valor, final) "
-                "VALUES (?, ?, ?, ?)",
-                (
-                    int(row["ID"]),
-                    str(pd.Timestamp(row["Data resgate"]).date()),
-                    float(row["Valor"]),
-                    int(bool(row["Final"])),
-                ),
-            )
-    print(f"  Resgates RF: {len(df)} registros migrados.")
-
-    # --- Transações RV ---
-    df = excel["Transações RV"]
-    with conectar() as conn:
-        for _, row in df.iterrows():
-            conn.execute(
-                "INSERT INTO transacoes_rv "
-                "(data, codigo, operacao, quantidade, preco, corretora, taxas) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (
-                    str(pd.Timestamp(row["Data"]).date()),
-                    str(row["Código"]),
-                    str(row["Operação C/V"]),
-                    int(row["Quantidade"]),
-                    float(row["Preço"]),
-                    str(row["Corretora"]),
-                    float(row["Taxas"]),
-                ),
-            )
-    print(f"  Transações RV: {len(df)} registros migrados.")
-
-    # --- Proventos RV ---
-    df = excel["Proventos RV"]
-    with conectar() as conn:
-        for _, row in df.iterrows():
-            conn.execute(
-                "INSERT INTO proventos_rv "
-                "(data_pagamento, codigo, quantidade, valor, tipo) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (
-                    str(pd.Timestamp(row["Data pagamento"]).date()),
-                    str(row["Código"]),
-                    int(row["Quantidade"]),
-                    float(row["Valor"]),
-                    str(row["Tipo"]),
-                ),
-            )
-    print(f"  Proventos RV: {len(df)} registros migrados.")
-
-    # --- Ativos RV ---
-    df = excel["Ativos RV"]
-    with conectar() as conn:
-        for _, row in df.iterrows():
-            conn.execute(
-                "INSERT INTO ativos_rv (codigo, tipo, benchmark) " "VALUES (?, ?, ?)",
-                (
-                    str(row["Código"]),
-                    str(row["Tipo"]),
-                    str(row["Benchmark"]),
-                ),
-            )
-    print(f"  Ativos RV: {len(df)} registros migrados.")
-
-    # --- Proporções ---
-    df = excel["Proporções"]
-    with conectar() as conn:
-        for _, row in df.iterrows():
-            conn.execute(
-                "INSERT INTO proporcoes (classe, proporcao) VALUES (?, ?)",
-                (
-                    str(row["Classe"]),
-                    float(row["Proporção"]),
-                ),
-            )
-    print(f"  Proporções: {len(df)} registros migrados.")
-
-    # --- Cotações ---
+    for aba, (tabela, colunas) in _PLANILHAS.items():
+        df = _converter_planilha(excel[aba], colunas)
+        _carregar(aba, tabela, df, incremental)
+
     if CAMINHO_COTACOES.exists():
-        df = pd.read_parquet(CAMINHO_COTACOES)
-        with conectar() as conn:
-            for _, row in df.iterrows():
-                conn.execute(
-                    "INSERT OR REPLACE INTO cotacoes (data, codigo, valor, variacao) "
-                    "VALUES (?, ?, ?, ?)",
-                    (
-                        str(row["data"]),
-                        str(row["codigo"]),
-                        float(row["valor"]) if pd.notna(row["valor"]) else None,
-                        float(row["variacao"]) if pd.notna(row["variacao"]) else None,
-                    ),
-                )
-        print(f"  Cotações: {len(df)} registros migrados.")
+        df = pd.read_parquet(CAMINHO_COTACOES, columns=_COLUNAS_COTACOES)
+        # Vale a última cotação de cada dia, como no INSERT OR REPLACE
+        df = df.drop_duplicates(["codigo", "data"], keep="last")
+        _carregar("Cotações", "cotacoes", df, incremental)
     else:
         print(f"Arquivo de cotações não encontrado: {CAMINHO_COTACOES}")
 
@@ -165,4 +159,10 @@ def migrar():
 
 
 if __name__ == "__main__":
-    migrar()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="mantém o banco e acrescenta apenas as linhas que ainda não existem",
+    )
+    migrar(incremental=parser.parse_args().incremental)
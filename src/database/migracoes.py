@@ -0,0 +1,337 @@
+"""
+Migrações versionadas do schema do banco SQLite.
+
+A versão do schema fica em `PRAGMA user_version`. Cada migração é aplicada numa
+transação própria, junto com a atualização da versão, então o banco nunca fica
+num estado intermediário. Bancos existentes são atualizados no próprio arquivo.
+
+Para alterar o schema, adicione uma nova função ao final de MIGRACOES. Nunca
+altere uma migração que já foi publicada.
+"""
+
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+
+# ---------------------------------------------------------------------------
+# Utilitários
+# ---------------------------------------------------------------------------
+
+
+def versao_atual(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def sql_da_tabela(conn: sqlite3.Connection, tabela: str) -> str:
+    (sql,) = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)
+    ).fetchone()
+    return sql
+
+
+@contextmanager
+def transacao_de_schema(conn: sqlite3.Connection):
+    """Transação para alterações de schema. As chaves estrangeiras são desligadas
+    durante a transação (necessário para reconstruir tabelas referenciadas por
+    outras) e a integridade é conferida antes do commit."""
+
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            if conn.execute("PRAGMA foreign_key_check").fetchall():
+                raise sqlite3.IntegrityError("Chave estrangeira inválida na migração")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+
+
+def reconstruir_tabela(
+    conn: sqlite3.Connection,
+    tabela: str,
+    sql_criacao: str,
+    selecao: str | None = None,
+):
+    """Substitui uma tabela por uma nova definição (copy-and-swap). A nova tabela
+    é criada com outro nome, preenchida com um único INSERT ... SELECT, e troca de
+    lugar com a antiga. Os índices da tabela antiga são recriados.
+
+    sql_criacao é o CREATE TABLE com o nome final da tabela. selecao é a lista de
+    expressões do SELECT sobre a tabela antiga, na ordem das colunas da nova
+    (padrão: as mesmas colunas)."""
+
+    indices = [
+        sql
+        for (sql,) in conn.execute(
+            "SELECT sql FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (tabela,),
+        )
+    ]
+
+    nova = f"{tabela}_nova"
+    conn.execute(
+        re.sub(
+            rf'^\s*CREATE TABLE\s+(IF NOT EXISTS\s+)?"?{tabela}"?',
+            f"CREATE TABLE {nova}",
+            sql_criacao,
+        )
+    )
+    colunas = [linha[1] for linha in conn.execute(f"PRAGMA table_info({nova})")]
+    conn.execute(
+        f"INSERT INTO {nova} ({', '.join(colunas)}) "
+        f"SELECT {selecao or ', '.join(colunas)} FROM {tabela}"
+    )
+    conn.execute(f"DROP TABLE {tabela}")
+    conn.execute(f"ALTER TABLE {nova} RENAME TO {tabela}")
+
+    for sql in indices:
+        conn.execute(sql)
+
+
+# ---------------------------------------------------------------------------
+# Migrações
+#
+# executescript não pode ser usado aqui, pois ele faz commit antes de executar.
+# Por isso cada comando é executado separadamente.
+# ---------------------------------------------------------------------------
+
+
+def _v1_schema_inicial(conn: sqlite3.Connection):
+    """Schema original. Em bancos anteriores ao versionamento, as tabelas já
+    existem e nada é feito."""
+
+    comandos = [
+        """
+        CREATE TABLE IF NOT EXISTS aportes_rf (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            corretora       TEXT    NOT NULL,
+            emissor         TEXT    NOT NULL,
+            tipo            TEXT    NOT NULL,
+            forma           TEXT    NOT NULL,
+            data_compra     TEXT    NOT NULL,  -- YYYY-MM-DD
+            data_vencimento TEXT    NOT NULL,  -- YYYY-MM-DD
+            indexador       TEXT    NOT NULL,
+            taxa            REAL    NOT NULL,
+            valor           REAL    NOT NULL,
+            reserva         INTEGER NOT NULL DEFAULT 0  -- 0=False, 1=True
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS resgates_rf (
+            rowid_          INTEGER PRIMARY KEY AUTOINCREMENT,
+            id              INTEGER NOT NULL,
+            data_resgate    TEXT    NOT NULL,  -- YYYY-MM-DD
+            valor           REAL    NOT NULL,
+            final           INTEGER NOT NULL DEFAULT 0,  -- 0=False, 1=True
+            FOREIGN KEY (id) REFERENCES aportes_rf(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS transacoes_rv (
+            rowid_          INTEGER PRIMARY KEY AUTOINCREMENT,
+            data            TEXT    NOT NULL,  -- YYYY-MM-DD
+            codigo          TEXT    NOT NULL,
+            operacao        TEXT    NOT NULL,
+            quantidade      INTEGER NOT NULL,
+            preco           REAL    NOT NULL,
+            corretora       TEXT    NOT NULL,
+            taxas           REAL    NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS proventos_rv (
+            rowid_          INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_pagamento  TEXT    NOT NULL,  -- YYYY-MM-DD
+            codigo          TEXT    NOT NULL,
+            quantidade      INTEGER NOT NULL,
+            valor           REAL    NOT NULL,
+            tipo            TEXT    NOT NULL DEFAULT 'Rendimento'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ativos_rv (
+            codigo          TEXT PRIMARY KEY,
+            tipo            TEXT NOT NULL,
+            benchmark       TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS proporcoes (
+            classe          TEXT PRIMARY KEY,
+            proporcao       REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cotacoes (
+            data            TEXT    NOT NULL,  -- YYYY-MM-DD
+            codigo          TEXT    NOT NULL,
+            valor           REAL,
+            variacao        REAL,
+            PRIMARY KEY (data, codigo)
+        )
+        """,
+    ]
+    for comando in comandos:
+        conn.execute(comando)
+
+
+def _v2_cotacoes_sem_rowid(conn: sqlite3.Connection):
+    """Chave (codigo, data) e sem rowid: as cotações de um mesmo código ficam
+    contíguas no arquivo, o que favorece as leituras por código e intervalo de
+    datas."""
+
+    if "WITHOUT ROWID" in sql_da_tabela(conn, "cotacoes").upper():
+        return
+
+    reconstruir_tabela(
+        conn,
+        "cotacoes",
+        """
+        CREATE TABLE cotacoes (
+            codigo          TEXT    NOT NULL,
+            data            TEXT    NOT NULL,  -- YYYY-MM-DD
+            valor           REAL,
+            variacao        REAL,
+            PRIMARY KEY (codigo, data)
+        ) WITHOUT ROWID
+        """,
+    )
+
+
+def _v3_indices(conn: sqlite3.Connection):
+    comandos = [
+        "CREATE INDEX IF NOT EXISTS idx_resgates_rf_id "
+        "ON resgates_rf (id, data_resgate)",
+        "CREATE INDEX IF NOT EXISTS idx_resgates_rf_data ON resgates_rf (data_resgate)",
+        "CREATE INDEX IF NOT EXISTS idx_transacoes_rv_codigo_data "
+        "ON transacoes_rv (codigo, data)",
+        "CREATE INDEX IF NOT EXISTS idx_proventos_rv_data_codigo "
+        "ON proventos_rv (data_pagamento, codigo)",
+    ]
+    for comando in comandos:
+        conn.execute(comando)
+
+
+def _v4_versoes(conn: sqlite3.Connection):
+    """Contador de escritas por tabela, usado para invalidar caches. O contador
+    começa no instante da criação (em milissegundos) para que um banco recriado
+    nunca repita a versão de um banco anterior."""
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS versoes (
+            tabela          TEXT    PRIMARY KEY,
+            versao          INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        "INSERT OR IGNORE INTO versoes (tabela, versao) VALUES "
+        "('cotacoes', CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))"
+    )
+
+
+def _v5_versoes_todas_as_tabelas(conn: sqlite3.Connection):
+    """Contadores para as demais tabelas, usados pelos caches do dashboard."""
+
+    for tabela in [
+        "aportes_rf",
+        "resgates_rf",
+        "transacoes_rv",
+        "proventos_rv",
+        "ativos_rv",
+        "proporcoes",
+    ]:
+        conn.execute(
+            "INSERT OR IGNORE INTO versoes (tabela, versao) VALUES "
+            "(?, CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))",
+            (tabela,),
+        )
+
+
+def _v6_cotacoes_indisponiveis(conn: sqlite3.Connection):
+    """Datas que a fonte não tem (dias sem divulgação da ANBIMA, ativos sem
+    negociação), para que a atualização não as peça de novo a cada execução. A
+    data segue o formato já usado em cotacoes; tentar_apos é um instante em
+    segundos desde 1970-01-01."""
+
+    colunas = conn.execute("PRAGMA table_info(cotacoes)")
+    tipos = {linha[1]: linha[2] for linha in colunas}
+    if tipos.get("data", "TEXT").upper() == "INTEGER":
+        tipo, formato = "INTEGER", "dias desde 1970-01-01"
+    else:
+        tipo, formato = "TEXT   ", "YYYY-MM-DD"
+
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS cotacoes_indisponiveis (
+            codigo          TEXT    NOT NULL,
+            data            {tipo} NOT NULL,  -- {formato}
+            tentativas      INTEGER NOT NULL,
+            tentar_apos     INTEGER NOT NULL,
+            PRIMARY KEY (codigo, data)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _v7_remover_cotacoes_vazias(conn: sqlite3.Connection):
+    """Remove as linhas de cotacoes sem valor e sem variação. Versões antigas da
+    atualização gravavam assim as datas sem CDI, que passavam a contar como
+    preenchidas e nunca eram pedidas de novo."""
+
+    removidas = conn.execute(
+        "DELETE FROM cotacoes WHERE valor IS NULL AND variacao IS NULL"
+    ).rowcount
+    if removidas:
+        conn.execute(
+            "UPDATE versoes SET versao = versao + 1 WHERE tabela = 'cotacoes'"
+        )
+
+
+# Lista ordenada de (versão, descrição, migração)
+MIGRACOES: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "schema inicial", _v1_schema_inicial),
+    (2, "cotacoes com chave (codigo, data) sem rowid", _v2_cotacoes_sem_rowid),
+    (3, "índices secundários", _v3_indices),
+    (4, "contador de versões por tabela", _v4_versoes),
+    (5, "contador de versões das demais tabelas", _v5_versoes_todas_as_tabelas),
+    (6, "datas de cotações indisponíveis", _v6_cotacoes_indisponiveis),
+    (7, "remoção de cotações sem valor", _v7_remover_cotacoes_vazias),
+]
+
+
+def aplicar_migracoes(conn: sqlite3.Connection) -> list[tuple[int, str, float]]:
+    """Aplica as migrações com versão maior que a do banco, em ordem. Retorna a
+    versão, a descrição e o tempo (em segundos) de cada migração aplicada."""
+
+    aplicadas = []
+    for versao, descricao, migracao in MIGRACOES:
+        if versao <= versao_atual(conn):
+            continue
+
+        inicio = time.perf_counter()
+        with transacao_de_schema(conn):
+            # Outro processo pode ter aplicado a migração enquanto esperávamos
+            # pelo lock de escrita
+            if versao <= versao_atual(conn):
+                continue
+            migracao(conn)
+            conn.execute(f"PRAGMA user_version = {versao}")
+        tempo = time.perf_counter() - inicio
+
+        print(f"Migração {versao} ({descricao}) aplicada em {tempo:.3f}s.")
+        aplicadas.append((versao, descricao, tempo))
+
+    if aplicadas:
+        conn.execute("PRAGMA optimize")
+    return aplicadas
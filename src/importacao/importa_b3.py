@@ -0,0 +1,288 @@
+"""
+Importação em lote de extratos da B3 e notas de corretagem.
+
+Uso:
+    python -m src.importacao.importa_b3 arquivo1.xlsx [arquivo2.csv ...]
+
+Formatos aceitos (CSV ou XLSX), reconhecidos pelas colunas:
+- Extrato de negociação da B3 (Área do Investidor): vira transações RV.
+- Extrato de movimentação da B3: os créditos de rendimentos, dividendos e JCP
+  viram proventos RV. As demais movimentações são ignoradas, pois as compras e
+  vendas vêm do extrato de negociação.
+- Nota de corretagem em planilha, com as colunas Data, C/V, Código, Quantidade,
+  Preço, Corretora e Taxas.
+
+Linhas que já estão no banco são ignoradas, então o mesmo arquivo pode ser
+importado mais de uma vez. Todos os arquivos são gravados numa única transação:
+se algum tiver linhas inválidas, nada é gravado.
+"""
+
+import sys
+from pathlib import Path
+from typing import BinaryIO
+
+import pandas as pd
+
+from src.database.database import carregar_tabela, transacao
+
+Arquivo = str | Path | BinaryIO
+
+# Colunas que identificam uma linha já cadastrada. A corretora, as taxas e o tipo
+# do provento ficam de fora porque podem ter sido digitados de outra forma.
+CHAVE_TRANSACOES = ["data", "codigo", "operacao", "quantidade", "preco"]
+CHAVE_PROVENTOS = ["data_pagamento", "codigo", "quantidade", "valor"]
+
+_COLUNAS_TRANSACOES = [*CHAVE_TRANSACOES, "corretora", "taxas"]
+_COLUNAS_PROVENTOS = [*CHAVE_PROVENTOS, "tipo"]
+
+# Movimentações do extrato da B3 que são proventos
+_TIPOS_PROVENTO = {
+    "Rendimento": "Rendimento",
+    "Dividendo": "Dividendo",
+    "Juros Sobre Capital Próprio": "JCP",
+}
+
+_OPERACOES = {"Compra": "C", "Venda": "V", "C": "C", "V": "V"}
+
+_PADRAO_CODIGO = r"^[A-Z0-9]{4}\d{1,2}$"
+
+
+# ---------------------------------------------------------------------------
+# Leitura e conversão de colunas
+# ---------------------------------------------------------------------------
+
+
+def ler_arquivo(arquivo: Arquivo) -> pd.DataFrame:
+    """Lê um CSV ou XLSX. Aceita um caminho ou um arquivo aberto com atributo
+    name (como os enviados pelo st.file_uploader)."""
+
+    nome = str(getattr(arquivo, "name", arquivo))
+    if Path(nome).suffix.lower() in (".xlsx", ".xls"):
+        df = pd.read_excel(arquivo, engine="openpyxl")
+    else:
+        # Os CSVs da B3 usam ; e os exportados por planilhas costumam usar ,
+        df = pd.read_csv(arquivo, sep=None, engine="python", encoding="utf-8-sig")
+    df.columns = df.columns.str.strip()
+    return df.dropna(how="all")
+
+
+def _para_numero(serie: pd.Series) -> pd.Series:
+    """Converte valores como 'R$ 1.234,56', '120.50' ou '-' (sem valor) em float.
+    O ponto só é tratado como separador de milhar quando o valor tem vírgula
+    decimal; nos demais casos o texto é convertido como está."""
+
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    texto = serie.astype(str).str.replace("R$", "", regex=False).str.strip()
+    decimal_virgula = texto.str.fullmatch(r"-?[\d.]+,\d+")
+    texto = texto.where(
+        ~decimal_virgula,
+        texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+    )
+    return pd.to_numeric(texto, errors="coerce")
+
+
+def _para_data(serie: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    texto = serie.astype(str).str.strip()
+    return pd.to_datetime(texto, format="%d/%m/%Y", errors="coerce")
+
+
+def _para_codigo(serie: pd.Series) -> pd.Series:
+    """Extrai o código de negociação. O extrato de movimentação traz o código
+    seguido do nome do ativo ('BDIF11 - BTG PACTUAL ...') e o mercado fracionário
+    acrescenta um F ao final (PETR4F)."""
+
+    codigo = serie.astype(str).str.split(" - ").str[0].str.strip().str.upper()
+    return codigo.str.replace(r"(\d)F$", r"\1", regex=True)
+
+
+# ---------------------------------------------------------------------------
+# Formatos
+# ---------------------------------------------------------------------------
+
+
+def _negociacao(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    transacoes = pd.DataFrame(
+        {
+            "data": _para_data(df["Data do Negócio"]),
+            "codigo": _para_codigo(df["Código de Negociação"]),
+            "operacao": df["Tipo de Movimentação"].str.strip().map(_OPERACOES),
+            "quantidade": _para_numero(df["Quantidade"]),
+            "preco": _para_numero(df["Preço"]),
+            "corretora": df["Instituição"].astype(str).str.strip(),
+            "taxas": 0.0,
+        }
+    )
+    return transacoes, pd.DataFrame(columns=_COLUNAS_PROVENTOS)
+
+
+def _movimentacao(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    movimentacao = df["Movimentação"].str.strip()
+    df = df.loc[
+        df["Entrada/Saída"].str.strip().eq("Credito")
+        & movimentacao.isin(_TIPOS_PROVENTO)
+    ]
+
+    quantidade = _para_numero(df["Quantidade"])
+    # O valor unitário às vezes vem vazio; nesse caso é calculado pelo total
+    valor = _para_numero(df["Preço unitário"]).fillna(
+        _para_numero(df["Valor da Operação"]) / quantidade
+    )
+    proventos = pd.DataFrame(
+        {
+            "data_pagamento": _para_data(df["Data"]),
+            "codigo": _para_codigo(df["Produto"]),
+            "quantidade": quantidade,
+            "valor": valor,
+            "tipo": movimentacao.loc[df.index].map(_TIPOS_PROVENTO),
+        }
+    )
+    return pd.DataFrame(columns=_COLUNAS_TRANSACOES), proventos
+
+
+def _nota(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    transacoes = pd.DataFrame(
+        {
+            "data": _para_data(df["Data"]),
+            "codigo": _para_codigo(df["Código"]),
+            "operacao": df["C/V"].astype(str).str.strip().str.upper().map(_OPERACOES),
+            "quantidade": _para_numero(df["Quantidade"]),
+            "preco": _para_numero(df["Preço"]),
+            "corretora": df["Corretora"].astype(str).str.strip(),
+            "taxas": _para_numero(df["Taxas"]).fillna(0.0),
+        }
+    )
+    return transacoes, pd.DataFrame(columns=_COLUNAS_PROVENTOS)
+
+
+# Coluna característica de cada formato -> conversor
+_FORMATOS = {
+    "Código de Negociação": _negociacao,
+    "Movimentação": _movimentacao,
+    "C/V": _nota,
+}
+
+
+def converter_arquivo(arquivo: Arquivo) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Converte um arquivo em transações e proventos com as colunas do banco."""
+
+    df = ler_arquivo(arquivo)
+    for coluna, conversor in _FORMATOS.items():
+        if coluna in df.columns:
+            transacoes, proventos = conversor(df)
+            # Guarda a linha do arquivo para as mensagens de erro
+            origem = str(getattr(arquivo, "name", arquivo))
+            return (
+                transacoes.assign(_origem=origem, _linha=transacoes.index + 2),
+                proventos.assign(_origem=origem, _linha=proventos.index + 2),
+            )
+    raise ValueError(f"Formato de arquivo não reconhecido: {arquivo}")
+
+
+# ---------------------------------------------------------------------------
+# Validação
+# ---------------------------------------------------------------------------
+
+
+def _validar(df: pd.DataFrame, regras: dict[str, pd.Series]) -> list[str]:
+    """Aplica as regras (máscaras das linhas inválidas) e descreve os erros."""
+
+    erros = []
+    for descricao, invalidas in regras.items():
+        for origem, linha in df.loc[invalidas, ["_origem", "_linha"]].itertuples(
+            index=False
+        ):
+            erros.append(f"{Path(origem).name}, linha {linha}: {descricao}")
+    return erros
+
+
+def _validar_transacoes(df: pd.DataFrame) -> list[str]:
+    return _validar(
+        df,
+        {
+            "data inválida": df["data"].isna(),
+            "código inválido": ~df["codigo"].str.match(_PADRAO_CODIGO),
+            "operação inválida": df["operacao"].isna(),
+            "quantidade inválida": ~df["quantidade"].gt(0)
+            | df["quantidade"].mod(1).ne(0),
+            "preço inválido": ~df["preco"].gt(0),
+            "taxas inválidas": ~df["taxas"].ge(0),
+        },
+    )
+
+
+def _validar_proventos(df: pd.DataFrame) -> list[str]:
+    return _validar(
+        df,
+        {
+            "data inválida": df["data_pagamento"].isna(),
+            "código inválido": ~df["codigo"].str.match(_PADRAO_CODIGO),
+            "quantidade inválida": ~df["quantidade"].gt(0)
+            | df["quantidade"].mod(1).ne(0),
+            "valor inválido": ~df["valor"].gt(0),
+        },
+    )
+
+
+# ---------------------------------------------------------------------------
+# Importação
+# ---------------------------------------------------------------------------
+
+
+def _concatenar(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    # Frames vazios são deixados de fora para não alterar os tipos das colunas
+    preenchidos = [df for df in frames if not df.empty]
+    return pd.concat(preenchidos or frames[:1], ignore_index=True)
+
+
+def importar(arquivos: list[Arquivo]) -> dict[str, tuple[int, int]]:
+    """Importa os arquivos numa única transação. Retorna, por tabela, quantas
+    linhas foram lidas e quantas eram novas e foram inseridas. Levanta
+    ValueError, sem gravar nada, se alguma linha for inválida."""
+
+    convertidos = [converter_arquivo(arquivo) for arquivo in arquivos]
+    transacoes = _concatenar([t for t, _ in convertidos])
+    proventos = _concatenar([p for _, p in convertidos])
+
+    erros = _validar_transacoes(transacoes) + _validar_proventos(proventos)
+    if erros:
+        raise ValueError("Linhas inválidas:\n" + "\n".join(erros))
+
+    transacoes = transacoes[_COLUNAS_TRANSACOES].astype({"quantidade": int})
+    proventos = proventos[_COLUNAS_PROVENTOS].astype({"quantidade": int})
+
+    with transacao():
+        novas_transacoes = carregar_tabela(
+            "transacoes_rv",
+            transacoes,
+            apenas_novas=True,
+            colunas_chave=CHAVE_TRANSACOES,
+        )
+        novos_proventos = carregar_tabela(
+            "proventos_rv",
+            proventos,
+            apenas_novas=True,
+            colunas_chave=CHAVE_PROVENTOS,
+        )
+
+    return {
+        "transacoes_rv": (len(transacoes), novas_transacoes),
+        "proventos_rv": (len(proventos), novos_proventos),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    try:
+        resultado = importar(sys.argv[1:])
+    except ValueError as erro:
+        print(erro)
+        sys.exit(1)
+
+    for tabela, (lidas, inseridas) in resultado.items():
+        print(f"{tabela}: {inseridas} novas de {lidas} linhas lidas.")
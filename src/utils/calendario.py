@@ -1,11 +1,15 @@
-from typing import List
+from functools import lru_cache
+from typing import List, Union
 from datetime import date
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
 CAMINHO_DADOS = Path(__file__).resolve().parent.parent.parent / "dados"
 
+Datas = Union[date, pd.Timestamp, np.ndarray, pd.Series, pd.Index, list]
+
 
 def le_feriados() -> pd.DatetimeIndex:
     csv_path = str(CAMINHO_DADOS / "feriados.csv")
@@ -18,7 +22,140 @@ def eh_dia_util(data: pd.Timestamp, feriados: pd.DatetimeIndex) -> bool:
     return data.weekday() < 5 and data not in feriados
 
 
-def dias_uteis_no_intervalo(data_inicial: date, data_final: date) -> List[date]:
-    feriados = le_feriados()
-    dias_uteis = pd.date_range(start=data_inicial, end=data_final, freq="B")
-    return [dia.date() for dia in dias_uteis if eh_dia_util(dia, feriados)]
+class Calendario:
+    """Calendário de dias úteis (segunda a sexta, exceto feriados) montado uma
+    única vez. Os feriados ficam num array ordenado de datetime64[D] e as consultas
+    são feitas com as funções vetorizadas do NumPy."""
+
+    def __init__(self, feriados: np.ndarray):
+        self.feriados = np.unique(np.asarray(feriados, dtype="datetime64[D]"))
+        self.busdaycal = np.busdaycalendar(weekmask="1111100", holidays=self.feriados)
+
+    def dias_uteis(self, data_inicial: date, data_final: date) -> np.ndarray:
+        """Retorna os dias úteis entre as datas, incluindo as extremidades."""
+
+        inicio = np.datetime64(data_inicial, "D")
+        fim = np.datetime64(data_final, "D")
+        dias = np.arange(inicio, fim + 1, dtype="datetime64[D]")
+        return dias[np.is_busday(dias, busdaycal=self.busdaycal)]
+
+    def contar(self, inicio: np.ndarray, fim: np.ndarray) -> np.ndarray:
+        return np.busday_count(inicio, fim, busdaycal=self.busdaycal)
+
+    def deslocar(self, datas: np.ndarray, dias: int, roll: str) -> np.ndarray:
+        return np.busday_offset(datas, dias, roll=roll, busdaycal=self.busdaycal)
+
+
+def _le_datas_iso(nome_arquivo: str) -> np.ndarray:
+    datas = pd.read_csv(CAMINHO_DADOS / nome_arquivo, header=None)[0]
+    return np.sort(datas.to_numpy().astype("datetime64[D]"))
+
+
+def _feriados_bancarios() -> np.ndarray:
+    return le_feriados().to_numpy().astype("datetime64[D]")
+
+
+def _feriados_pregao() -> np.ndarray:
+    """Dias sem pregão na B3. Dentro do período coberto por dias_uteis.csv, qualquer
+    dia de semana fora da lista é considerado fechado, assim como os dias de
+    dias_sem_pregao.csv (vésperas de Natal e Ano Novo, feriados municipais de SP).
+    Fora desse período valem os feriados bancários."""
+
+    dias_uteis = _le_datas_iso("dias_uteis.csv")
+    sem_pregao = _le_datas_iso("dias_sem_pregao.csv")
+    feriados = _feriados_bancarios()
+
+    periodo = np.arange(dias_uteis[0], dias_uteis[-1] + 1, dtype="datetime64[D]")
+    fora_da_lista = np.setdiff1d(periodo[np.is_busday(periodo)], dias_uteis)
+    fora_do_periodo = feriados[(feriados < dias_uteis[0]) | (feriados > dias_uteis[-1])]
+    return np.union1d(np.union1d(fora_da_lista, fora_do_periodo), sem_pregao)
+
+
+CALENDARIO_BANCARIO = "bancario"
+CALENDARIO_PREGAO = "pregao"
+
+# Calendário bancário é usado no acúmulo de CDI/VNA e títulos pré-fixados. O de
+# pregão é usado para os ativos negociados na bolsa.
+_CALENDARIOS = {
+    CALENDARIO_BANCARIO: _feriados_bancarios,
+    CALENDARIO_PREGAO: _feriados_pregao,
+}
+
+
+@lru_cache(maxsize=None)
+def obter_calendario(nome: str = CALENDARIO_BANCARIO) -> Calendario:
+    """Calendário compartilhado pelo processo. Os CSVs são lidos apenas na
+    primeira chamada de cada calendário."""
+
+    if nome not in _CALENDARIOS:
+        raise ValueError(f"Calendário desconhecido: {nome}")
+    return Calendario(_CALENDARIOS[nome]())
+
+
+def _para_datetime64(datas: Datas) -> np.ndarray:
+    if isinstance(datas, (pd.Series, pd.Index)):
+        datas = datas.to_numpy()
+    if isinstance(datas, np.ndarray) and datas.dtype.kind == "M":
+        return datas.astype("datetime64[D]")
+    if np.ndim(datas) == 0:
+        return np.datetime64(pd.Timestamp(datas), "D")
+    return np.array([pd.Timestamp(d) for d in datas], dtype="datetime64[D]")
+
+
+def _formatar_saida(resultado: np.ndarray, referencia: Datas):
+    """Devolve o resultado no mesmo formato da entrada: escalar, array ou Series
+    (mantendo o índice)."""
+
+    if isinstance(referencia, pd.Series):
+        return pd.Series(resultado, index=referencia.index, name=referencia.name)
+    if np.ndim(resultado) == 0:
+        return resultado.item()
+    return resultado
+
+
+def dias_uteis_no_intervalo(
+    data_inicial: date, data_final: date, calendario: str = CALENDARIO_BANCARIO
+) -> List[date]:
+    return obter_calendario(calendario).dias_uteis(data_inicial, data_final).tolist()
+
+
+def contar_dias_uteis(
+    data_inicial: Datas, data_final: Datas, calendario: str = CALENDARIO_BANCARIO
+):
+    """Conta os dias úteis no intervalo [data_inicial, data_final). Aceita datas
+    escalares ou arrays/Series do mesmo tamanho."""
+
+    resultado = obter_calendario(calendario).contar(
+        _para_datetime64(data_inicial), _para_datetime64(data_final)
+    )
+    referencia = data_inicial if np.ndim(data_inicial) else data_final
+    return _formatar_saida(resultado, referencia)
+
+
+def deslocar_dias_uteis(
+    datas: Datas, dias: int, calendario: str = CALENDARIO_BANCARIO
+):
+    """Desloca as datas em uma quantidade de dias úteis. Uma data que não é dia
+    útil conta como se estivesse entre dois dias úteis, ou seja, um sábado deslocado
+    em +1 vira a segunda-feira e em -1 vira a sexta-feira. Com dias=0 as datas são
+    levadas ao próximo dia útil."""
+
+    roll = "backward" if dias > 0 else "forward"
+    resultado = obter_calendario(calendario).deslocar(
+        _para_datetime64(datas), dias, roll
+    )
+    return _formatar_saida(resultado, datas)
+
+
+def dia_util_anterior(
+    datas: Datas, incluir_data: bool = False, calendario: str = CALENDARIO_BANCARIO
+):
+    """Retorna o último dia útil antes de cada data. Com incluir_data=True a
+    própria data é retornada quando já for dia útil."""
+
+    cal = obter_calendario(calendario)
+    if incluir_data:
+        resultado = cal.deslocar(_para_datetime64(datas), 0, "backward")
+    else:
+        resultado = cal.deslocar(_para_datetime64(datas), -1, "forward")
+    return _formatar_saida(resultado, datas)
@@ -0,0 +1,17 @@
+import pytest
+
+from src.database import database
+
+
+@pytest.fixture(params=["texto", "inteiro"])
+def banco(request, tmp_path, monkeypatch):
+    """Banco vazio num diretório temporário, com as datas gravadas como texto ou
+    como inteiros (dias desde 1970-01-01)."""
+
+    monkeypatch.setattr(database, "CAMINHO_DB", tmp_path / "investimentos.db")
+    monkeypatch.setattr(database, "_modo_leitura", None)
+    database.criar_tabelas()
+    if request.param == "inteiro":
+        database.converter_datas_para_inteiro()
+    yield request.param
+    database.fechar_conexoes()
@@ -0,0 +1,42 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src.database import database
+from src.utils.calendario import CALENDARIO_PREGAO, dias_uteis_no_intervalo
+
+
+@pytest.fixture
+def dados(monkeypatch):
+    pytest.importorskip("streamlit")
+    # O módulo passa as leituras para conexões somente leitura ao ser importado
+    monkeypatch.setattr(database, "_modo_leitura", database._modo_leitura)
+    from src.dashboard import dados
+
+    return dados
+
+
+def test_patrimonio_total_mantem_renda_variavel_nos_dias_sem_pregao(dados):
+    # 24/12 e 31/12 são dias úteis bancários sem pregão. O histórico cobre mais
+    # de um ano para que as métricas tenham o saldo de um ano atrás.
+    inicio, fim = date(2023, 12, 1), date(2024, 12, 31)
+    patrimonio_rf = pd.DataFrame(
+        {"data": dias_uteis_no_intervalo(inicio, fim), "index": "CDI", "valor": 1000.0}
+    )
+    patrimonio_rv = pd.DataFrame(
+        {
+            "data": dias_uteis_no_intervalo(inicio, fim, CALENDARIO_PREGAO),
+            "tipo_ativo": "ETF",
+            "bench": "IBOV",
+            "patrimonio": 500.0,
+        }
+    )
+
+    total = dados.calcular_df_patrimonio_total(patrimonio_rf, patrimonio_rv)
+
+    saldo = total.groupby("data")["saldo"].sum()
+    assert saldo.index.tolist() == dias_uteis_no_intervalo(inicio, fim)
+    assert (saldo == 1500.0).all()
+    atual, retorno_total, _, retorno_ultimo_ano = dados.calcular_metricas_patr(total)
+    assert (atual, retorno_total, retorno_ultimo_ano) == (1500.0, 0.0, 0.0)
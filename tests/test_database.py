@@ -0,0 +1,125 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src.database import database
+
+
+def _transacoes(*datas: str) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "data": pd.to_datetime(list(datas)),
+            "codigo": "BOVA11",
+            "operacao": "C",
+            "quantidade": 10,
+            "preco": 120.5,
+            "corretora": "XP",
+            "taxas": 0.0,
+        }
+    )
+
+
+def test_carregar_tabela_apenas_novas_ignora_linhas_existentes(banco):
+    df = _transacoes("2024-01-02", "2024-01-03")
+
+    assert database.carregar_tabela("transacoes_rv", df, apenas_novas=True) == 2
+    assert database.carregar_tabela("transacoes_rv", df, apenas_novas=True) == 0
+    assert len(database.ler_transacoes_rv()) == 2
+
+
+def test_carregar_tabela_apenas_novas_conta_repeticoes(banco):
+    database.carregar_tabela("transacoes_rv", _transacoes("2024-01-02"))
+    df = _transacoes("2024-01-02", "2024-01-02", "2024-01-04")
+
+    assert database.carregar_tabela("transacoes_rv", df, apenas_novas=True) == 2
+    datas = database.ler_transacoes_rv()["data"].tolist()
+    assert sorted(datas) == [date(2024, 1, 2), date(2024, 1, 2), date(2024, 1, 4)]
+
+
+def test_carregar_snapshot_retorna_versoes_da_mesma_transacao(banco):
+    database.inserir_transacoes_rv(_transacoes("2024-01-02"))
+    versao = database.ler_versao("transacoes_rv")
+
+    tabelas, versoes, tempos = database.carregar_snapshot()
+
+    assert versoes["transacoes_rv"] == versao
+    assert len(tabelas["transacoes_rv"]) == 1
+    assert set(tempos) == set(tabelas)
+
+
+def test_ler_datas_faltantes_apos_primeira_cotacao(banco):
+    database.inserir_cotacoes(
+        [
+            (date(2024, 1, 3), "CDI", None, 1.0004),
+            (date(2024, 1, 5), "CDI", None, 1.0004),
+        ]
+    )
+    dias = [date(2024, 1, d) for d in (2, 3, 4, 5)]
+
+    faltantes = database.ler_datas_faltantes(
+        [(["CDI", "VNA"], dias)], apos_primeira_cotacao=True
+    )
+
+    # O CDI começa na sua primeira cotação; o VNA, sem cotações, na do banco
+    assert faltantes == {
+        "CDI": [date(2024, 1, 4)],
+        "VNA": [date(2024, 1, 3), date(2024, 1, 4), date(2024, 1, 5)],
+    }
+
+
+def test_ler_datas_faltantes_respeita_indisponiveis(banco):
+    dias = [date(2024, 1, 2), date(2024, 1, 3)]
+    database.registrar_indisponiveis({"VNA": [date(2024, 1, 2)]}, 3600, 86400)
+
+    assert database.ler_datas_faltantes([(["VNA"], dias)]) == {
+        "VNA": [date(2024, 1, 3)]
+    }
+    assert database.ler_datas_faltantes(
+        [(["VNA"], dias)], incluir_indisponiveis=True
+    ) == {"VNA": dias}
+
+
+def test_fechar_conexoes_so_fecha_as_da_thread_atual(banco):
+    outra = {}
+
+    def abrir():
+        with database.conectar() as conn:
+            outra["conn"] = conn
+
+    thread = threading.Thread(target=abrir)
+    thread.start()
+    thread.join()
+    with database.conectar() as conn:
+        propria = conn
+
+    database.fechar_conexoes()
+
+    assert propria.fechada
+    assert not outra["conn"].fechada
+    outra["conn"].execute("SELECT 1")
+
+
+def test_conversao_das_datas_vale_para_conexoes_ja_abertas(banco):
+    if banco == "inteiro":
+        pytest.skip("o banco já guarda as datas como inteiros")
+    database.inserir_cotacoes([(date(2024, 1, 2), "VNA", 4000.0, None)])
+    executor = ThreadPoolExecutor(max_workers=1)
+    # A conexão da outra thread já sabe que as datas são texto
+    executor.submit(database.ler_cotacoes, data_inicio=date(2024, 1, 1)).result()
+
+    database.converter_datas_para_inteiro()
+    executor.submit(
+        database.inserir_cotacoes, [(date(2024, 1, 3), "VNA", 4001.0, None)]
+    ).result()
+    cotacoes = executor.submit(
+        database.ler_cotacoes, data_inicio=date(2024, 1, 3)
+    ).result()
+    executor.shutdown()
+
+    assert cotacoes["data"].tolist() == [date(2024, 1, 3)]
+    with database.conectar() as conn:
+        tipos = conn.execute("SELECT DISTINCT typeof(data) FROM cotacoes").fetchall()
+    assert tipos == [("integer",)]
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from src.database import database
+from src.importacao.importa_b3 import _para_numero, importar
+
+NOTA = """Data;C/V;Código;Quantidade;Preço;Corretora;Taxas
+02/01/2024;C;BOVA11;10;120,50;XP;0,30
+02/01/2024;C;BOVA11;10;120,50;XP;0,30
+15/02/2024;V;IVVB11F;3;280,10;XP;0
+"""
+
+MOVIMENTACAO = """Entrada/Saída;Data;Movimentação;Produto;Instituição;Quantidade;\
+Preço unitário;Valor da Operação
+Credito;15/01/2024;Rendimento;HGLG11 - CSHG LOGISTICA;XP;20;1,10;22,00
+Credito;15/02/2024;Rendimento;HGLG11 - CSHG LOGISTICA;XP;20;;22,00
+Debito;20/02/2024;Transferência - Liquidação;BOVA11 - ISHARES;XP;10;;1205,00
+"""
+
+
+def _arquivos(tmp_path):
+    nota = tmp_path / "nota.csv"
+    nota.write_text(NOTA, encoding="utf-8")
+    movimentacao = tmp_path / "movimentacao.csv"
+    movimentacao.write_text(MOVIMENTACAO, encoding="utf-8")
+    return [nota, movimentacao]
+
+
+def test_importar_duas_vezes_nao_duplica(banco, tmp_path):
+    arquivos = _arquivos(tmp_path)
+
+    assert importar(arquivos) == {"transacoes_rv": (3, 3), "proventos_rv": (2, 2)}
+    assert importar(arquivos) == {"transacoes_rv": (3, 0), "proventos_rv": (2, 0)}
+    assert len(database.ler_transacoes_rv()) == 3
+    assert len(database.ler_proventos_rv()) == 2
+
+
+def test_para_numero_aceita_virgula_e_ponto_decimal():
+    serie = pd.Series(["R$ 1.234,56", "120,50", "120.50", "-1.000,00", "-", "1234"])
+
+    resultado = _para_numero(serie)
+
+    assert resultado.iloc[:4].tolist() == [1234.56, 120.5, 120.5, -1000.0]
+    assert pd.isna(resultado.iloc[4])
+    assert resultado.iloc[5] == 1234.0